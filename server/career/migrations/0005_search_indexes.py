@@ -0,0 +1,15 @@
+from django.db import migrations
+from core.search import AddTrigramIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('career', '0004_alter_followup_created_at_alter_followup_updated_at_and_more'),
+    ]
+
+    operations = [
+        AddTrigramIndex("job", "title"),
+        AddTrigramIndex("job", "company"),
+        AddTrigramIndex("job", "notes"),
+    ]
@@ -9,6 +9,11 @@ class CoreConfig(AppConfig):
         from . import signals
         import sys
         import core.admin
+        from .replicas import check_write_cache
+        from .schema import warm_model_schemas
+
+        check_write_cache()
+        warm_model_schemas()
 
         if "runserver" in sys.argv:
             print("Welcome Daniel!")
@@ -0,0 +1,61 @@
+from asgiref.sync import sync_to_async
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import close_old_connections
+import functools
+
+# True while a view runs under an async route, so it may return async bodies
+in_async_view = ContextVar("in_async_view", default=False)
+
+
+def run_view(view, request, *args, **kwargs):
+    """
+    Runs a DRF view to a rendered response inside a worker thread, with the
+    connection housekeeping Django's handlers do around a request.
+    """
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render") and not response.is_rendered:
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+class AsyncViewSetMixin:
+    """
+    With ASYNC_VIEWS on (ASGI deployments), routes get coroutine views.
+    `async_actions` run in a thread of their own, so one slow list or
+    analytics call doesn't queue every other request behind it; anything
+    else keeps Django's default of sharing the one sync thread.
+    """
+
+    async_actions = ("list", "retrieve")
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not settings.ASYNC_VIEWS:
+            return view
+
+        read_methods = {
+            method for method, action in actions.items() if action in cls.async_actions
+        }
+        if "get" in read_methods:
+            read_methods.add("head")
+
+        async def async_view(request, *args, **kwargs):
+            thread_sensitive = request.method.lower() not in read_methods
+            token = in_async_view.set(True)
+            try:
+                return await sync_to_async(
+                    run_view, thread_sensitive=thread_sensitive
+                )(view, request, *args, **kwargs)
+            finally:
+                in_async_view.reset(token)
+
+        functools.update_wrapper(async_view, view)
+        # For callers that are already synchronous, like /batch
+        async_view.sync_view = view
+        return async_view
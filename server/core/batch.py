@@ -0,0 +1,144 @@
+from asgiref.sync import async_to_sync
+from django.core.exceptions import FieldError
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from django.utils.http import urlencode
+from rest_framework.views import APIView
+import json
+
+# Headers that only make sense for the outer batch request
+DROPPED_META = (
+    "CONTENT_LENGTH",
+    "CONTENT_TYPE",
+    "HTTP_ACCEPT_ENCODING",
+    "HTTP_IF_NONE_MATCH",
+    "HTTP_IF_MODIFIED_SINCE",
+)
+
+
+class BatchItemError(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def resolve_route(route):
+    """
+    Resolves `route` (e.g. "finance/transactions") to an API view, with or
+    without the router's trailing slash.
+    """
+    path = "/" + route.strip("/")
+    for candidate in (path + "/", path):
+        try:
+            match = resolve(candidate)
+        except Resolver404:
+            continue
+        view_class = getattr(match.func, "cls", None)
+        if view_class is not None and issubclass(view_class, APIView):
+            return candidate, match
+    raise BatchItemError(404, f"Unknown route {route}")
+
+
+def build_subrequest(request, path, params):
+    """
+    A GET request for `path` sharing the batch request's headers and its
+    already authenticated user, so sub-requests skip token lookups.
+    """
+    params = {key: value for key, value in params.items() if value is not None}
+    query_string = urlencode(params, doseq=True)
+    subrequest = HttpRequest()
+    subrequest.method = "GET"
+    subrequest.path = subrequest.path_info = path
+    subrequest.META = {
+        key: value
+        for key, value in request.META.items()
+        if key not in DROPPED_META and not key.startswith("wsgi.")
+    }
+    subrequest.META.update(
+        REQUEST_METHOD="GET",
+        PATH_INFO=path,
+        QUERY_STRING=query_string,
+        HTTP_ACCEPT="application/json",
+    )
+    subrequest.GET = QueryDict(query_string)
+    subrequest.COOKIES = request.COOKIES
+    subrequest.user = request.user
+    subrequest._force_auth_user = request.user
+    subrequest._force_auth_token = request.auth
+    subrequest._dont_enforce_csrf_checks = True
+    return subrequest
+
+
+async def join_async_chunks(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+def get_response_body(response):
+    """
+    The rendered JSON of a sub-response as bytes, or b"null" when it has no
+    JSON body (304s, deletes, non-JSON views).
+    """
+    if hasattr(response, "render"):
+        response.render()
+    if not response.get("Content-Type", "").startswith("application/json"):
+        return b"null"
+    if response.streaming and response.is_async:
+        content = async_to_sync(join_async_chunks)(response.streaming_content)
+    elif response.streaming:
+        content = b"".join(response.streaming_content)
+    else:
+        content = response.content
+    return content or b"null"
+
+
+def run_batch_item(request, item):
+    """
+    Returns (status code, JSON bytes) for one `{route, params}` item.
+    """
+    if not isinstance(item, dict) or not isinstance(item.get("route"), str):
+        raise BatchItemError(400, "Each request needs a route")
+    params = item.get("params") or {}
+    if not isinstance(params, dict):
+        raise BatchItemError(400, "params must be an object")
+
+    path, match = resolve_route(item["route"])
+    subrequest = build_subrequest(request, path, params)
+    subrequest.resolver_match = match
+    # Async routes keep their synchronous view around for callers like this
+    view = getattr(match.func, "sync_view", match.func)
+    try:
+        response = view(subrequest, *match.args, **match.kwargs)
+    except DjangoValidationError as exc:
+        raise BatchItemError(400, " ".join(exc.messages))
+    except (FieldError, ValueError) as exc:
+        # Filter values the ORM could not convert, e.g. {"id": "abc"}
+        raise BatchItemError(400, str(exc))
+    return response.status_code, get_response_body(response)
+
+
+def run_batch(request, items):
+    """
+    Runs every item in order on the current connection and returns the
+    combined JSON body. Sub-response bodies are spliced in as rendered, so
+    cached responses are never decoded again.
+    """
+    results = []
+    for item in items:
+        route = item.get("route") if isinstance(item, dict) else None
+        try:
+            status_code, body = run_batch_item(request, item)
+        except BatchItemError as exc:
+            status_code = exc.status_code
+            body = json.dumps({"detail": exc.detail}).encode("utf-8")
+        except Exception as e:
+            # One broken item must not fail the items after it
+            print("Batch item failed:", e)
+            status_code = 500
+            body = b'{"detail":"Server error"}'
+        results.append(
+            b'{"route":%s,"status":%d,"data":%s}'
+            % (json.dumps(route).encode("utf-8"), status_code, body)
+        )
+    return b'{"results":[' + b",".join(results) + b"]}"
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from functools import lru_cache
+from .versions import get_model_versions
+from .fastpath import get_fast_fields, get_values_queryset, serialize_rows
+from .renderers import CamelCaseJSONRenderer
+import hashlib
+
+
+@lru_cache(maxsize=None)
+def get_bootstrap_tables():
+    """
+    (key, viewset class) for each reference table in BOOTSTRAP_TABLES.
+    """
+    return tuple(
+        (key, import_string(path)) for key, path in settings.BOOTSTRAP_TABLES.items()
+    )
+
+
+def get_view_permission(model):
+    return f"{model._meta.app_label}.view_{model._meta.model_name}"
+
+
+def serialize_table(viewset_class):
+    """
+    Every row of a table as its viewset's page=all would list it.
+    """
+    queryset = viewset_class.queryset.all().order_by("-id")
+    serializer_class = viewset_class.serializer_class
+    fast_fields = get_fast_fields(serializer_class)
+    if fast_fields is None:
+        return serializer_class(queryset, many=True).data
+    return serialize_rows(
+        queryset.model, fast_fields, get_values_queryset(queryset, fast_fields)
+    )
+
+
+def get_snapshot(tables):
+    """
+    Returns (version, rendered JSON) for `tables`. The version is derived
+    from the tables' model version counters, so the snapshot is only
+    rebuilt after one of them is written to.
+    """
+    versions = get_model_versions(*[viewset.queryset.model for _, viewset in tables])
+    signature = [[key for key, _ in tables], versions]
+    version = hashlib.sha1(repr(signature).encode("utf-8")).hexdigest()
+    cache_key = f"bootstrap:{version}"
+
+    content = cache.get(cache_key)
+    if content is None:
+        data = {"version": version}
+        for key, viewset in tables:
+            data[key] = serialize_table(viewset)
+        content = CamelCaseJSONRenderer().render(data)
+        cache.set(cache_key, content, settings.BOOTSTRAP_CACHE_TIMEOUT)
+    return version, content
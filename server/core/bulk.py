@@ -0,0 +1,232 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models
+from django.db.models.signals import pre_save, post_save
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from .versions import bump_model_version_on_commit
+
+READ_ONLY_PK = 1000000
+
+
+def to_pk(model, value):
+    """
+    Normalizes a client-sent primary key, raising ValueError on garbage.
+    """
+    if value is None or isinstance(value, bool):
+        raise ValueError(value)
+    try:
+        return model._meta.pk.to_python(value)
+    except DjangoValidationError:
+        raise ValueError(value)
+
+
+class ResolvedRelations:
+    """
+    Stands in for a related field's queryset during bulk validation so
+    every `queryset.get(pk=...)` is answered from one `in_bulk` lookup.
+    """
+
+    def __init__(self, queryset, pks):
+        self.model = queryset.model
+        self.objects = queryset.in_bulk(pks)
+
+    def get(self, pk):
+        obj = self.objects.get(to_pk(self.model, pk))
+        if obj is None:
+            raise self.model.DoesNotExist
+        return obj
+
+
+def resolve_relations(serializer, items):
+    """
+    Swaps the querysets of the primary key fields of `serializer` for
+    ResolvedRelations covering the ids used across `items`.
+    """
+    for name, field in serializer.fields.items():
+        if field.read_only:
+            continue
+        many = isinstance(field, ManyRelatedField)
+        relation = field.child_relation if many else field
+        if not isinstance(relation, PrimaryKeyRelatedField):
+            continue
+
+        pks = set()
+        for item in items:
+            values = item.get(name) if isinstance(item, dict) else None
+            if not many:
+                values = [values]
+            if not isinstance(values, list):
+                continue
+            for value in values:
+                try:
+                    pks.add(to_pk(relation.get_queryset().model, value))
+                except ValueError:
+                    pass
+        relation.queryset = ResolvedRelations(relation.get_queryset(), pks)
+
+
+class BulkUpdateListSerializer(serializers.ListSerializer):
+    """
+    Validates partial updates against a `{pk: instance}` map, matching each
+    item to its instance by `id`.
+    """
+
+    def run_child_validation(self, data):
+        try:
+            pk = to_pk(self.child.Meta.model, data.get("id"))
+        except (AttributeError, ValueError):
+            raise serializers.ValidationError({"id": ["A valid id is required."]})
+        self.child.instance = self.instance.get(pk)
+        if self.child.instance is None:
+            raise serializers.ValidationError({"id": ["Not found."]})
+        self.child.initial_data = data
+        return super().run_child_validation(data)
+
+
+def supports_bulk_writes(model, serializer):
+    """
+    bulk_create/bulk_update bypass save() and the serializer's create/update,
+    so they are only used when neither is customized.
+    """
+    return (
+        model.save is models.Model.save
+        and type(serializer).create is serializers.ModelSerializer.create
+        and type(serializer).update is serializers.ModelSerializer.update
+    )
+
+
+def split_many_to_many(model, attrs):
+    return {
+        field: attrs.pop(field.name)
+        for field in model._meta.many_to_many
+        if field.name in attrs
+    }
+
+
+def set_many_to_many(model, changes):
+    """
+    Replaces the many-to-many rows of every `(obj, {field: values})` pair with
+    one delete and one insert per field.
+    """
+    by_field = {}
+    for obj, m2m in changes:
+        for field, values in m2m.items():
+            by_field.setdefault(field, []).append((obj, values))
+
+    for field, pairs in by_field.items():
+        through = field.remote_field.through
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        pks = [obj.pk for obj, _ in pairs]
+        through.objects.filter(**{f"{source}__in": pks}).delete()
+        through.objects.bulk_create(
+            [
+                through(**{f"{source}_id": obj.pk, f"{target}_id": value.pk})
+                for obj, values in pairs
+                for value in values
+            ],
+            ignore_conflicts=True,
+        )
+        bump_model_version_on_commit(field.related_model)
+
+
+def touch_auto_now(obj):
+    for field in obj._meta.concrete_fields:
+        if getattr(field, "auto_now", False):
+            field.pre_save(obj, add=False)
+
+
+def send_save_signals(signal, model, objs, created):
+    for obj in objs:
+        kwargs = {"created": obj.pk in created} if signal is post_save else {}
+        signal.send(
+            sender=model,
+            instance=obj,
+            raw=False,
+            using=obj._state.db or "default",
+            update_fields=None,
+            **kwargs,
+        )
+
+
+def bulk_save(model, creates, updates):
+    """
+    Writes validated rows in as few statements as possible.
+    `creates` holds `(client id or None, attrs)` pairs and is upserted on the
+    primary key; `updates` holds `(instance, attrs)` pairs. Returns the
+    created and updated objects in input order.
+    """
+    created_objs = []
+    m2m_changes = []
+    for pk, attrs in creates:
+        m2m = split_many_to_many(model, attrs)
+        obj = model(**attrs)
+        if pk is not None:
+            obj.pk = pk
+        created_objs.append(obj)
+        m2m_changes.append((obj, m2m))
+
+    updated_objs = []
+    update_fields = set()
+    for obj, attrs in updates:
+        m2m = split_many_to_many(model, attrs)
+        for name, value in attrs.items():
+            setattr(obj, name, value)
+        update_fields.update(model._meta.get_field(name).attname for name in attrs)
+        touch_auto_now(obj)
+        updated_objs.append(obj)
+        m2m_changes.append((obj, m2m))
+
+    upsert_pks = [obj.pk for obj in created_objs if obj.pk is not None]
+    existing = set(
+        model.objects.filter(pk__in=upsert_pks).values_list("pk", flat=True)
+    )
+    created_pks = set()
+
+    objs = created_objs + updated_objs
+    send_save_signals(pre_save, model, objs, created_pks)
+    if created_objs:
+        fields = [
+            field.name
+            for field in model._meta.concrete_fields
+            if not field.primary_key and not getattr(field, "auto_now_add", False)
+        ]
+        model.objects.bulk_create(
+            created_objs,
+            update_conflicts=bool(upsert_pks),
+            unique_fields=[model._meta.pk.name] if upsert_pks else None,
+            update_fields=fields if upsert_pks else None,
+        )
+        created_pks = {obj.pk for obj in created_objs if obj.pk not in existing}
+    if updated_objs:
+        update_fields.update(
+            field.attname
+            for field in model._meta.concrete_fields
+            if getattr(field, "auto_now", False)
+        )
+        model.objects.bulk_update(updated_objs, sorted(update_fields))
+    set_many_to_many(model, m2m_changes)
+    send_save_signals(post_save, model, objs, created_pks)
+    return created_objs, updated_objs
+
+
+def serial_save(serializer, model, creates, updates):
+    """
+    Per-object fallback for models or serializers with their own save logic.
+    """
+    created_objs = []
+    for pk, attrs in creates:
+        try:
+            instance = model.objects.get(pk=pk) if pk is not None else None
+        except ObjectDoesNotExist:
+            instance = None
+        if instance is not None:
+            created_objs.append(serializer.update(instance, attrs))
+        else:
+            if pk is not None:
+                attrs["id"] = pk
+            created_objs.append(serializer.create(attrs))
+
+    updated_objs = [serializer.update(instance, attrs) for instance, attrs in updates]
+    return created_objs, updated_objs
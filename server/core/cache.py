@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+from .conditional import etag_matches
+from .replicas import replica_alias
+from .versions import get_model_versions
+import hashlib
+
+
+class CachedResponseMixin:
+    """
+    Serves repeated GETs from the cache. Keys combine the version counters
+    of the models a response reads with the path, query params and media
+    type, so saving or deleting any of those models retires the entry.
+    """
+
+    cache_key = None
+
+    def get_cached_response(self, *models):
+        request = self.request
+        signature = [
+            request.path,
+            sorted(request.query_params.lists()),
+            getattr(request, "accepted_media_type", None),
+            get_model_versions(*models),
+        ]
+        digest = hashlib.sha1(repr(signature).encode("utf-8")).hexdigest()
+        self.cache_key = f"response:{digest}"
+
+        cached = cache.get(self.cache_key)
+        if cached is None:
+            return None
+
+        etag, content, content_type = cached
+        self.etag = etag
+        if etag_matches(etag, request.headers.get("If-None-Match")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return HttpResponse(content, content_type=content_type)
+
+    def store_cached_response(self, response):
+        cache.set(
+            self.cache_key,
+            (getattr(self, "etag", None), response.content, response["Content-Type"]),
+            settings.RESPONSE_CACHE_TIMEOUT,
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # A lagging replica can answer with rows older than the versions in
+        # the key, so only responses read from the primary are stored
+        if (
+            self.cache_key
+            and replica_alias.get() is None
+            and isinstance(response, Response)
+            and response.status_code == 200
+        ):
+            response.add_post_render_callback(self.store_cached_response)
+        return response
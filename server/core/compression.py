@@ -0,0 +1,149 @@
+from collections import defaultdict
+from django.conf import settings
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class GzipCompressor:
+    encoding = "gzip"
+
+    def __init__(self, level):
+        # 16 + MAX_WBITS writes the gzip header and trailer
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliCompressor:
+    encoding = "br"
+
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class ZstdCompressor:
+    encoding = "zstd"
+
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+def get_compressors():
+    """
+    Available compressors in server preference order.
+    """
+    compressors = []
+    if zstandard is not None:
+        compressors.append(ZstdCompressor)
+    if brotli is not None:
+        compressors.append(BrotliCompressor)
+    compressors.append(GzipCompressor)
+    return compressors
+
+
+def parse_accept_encoding(header):
+    """
+    Returns {coding: q} for an Accept-Encoding header.
+    """
+    accepted = {}
+    for part in header.split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+def choose_compressor(header):
+    """
+    The preferred compressor the client accepts, or None.
+    """
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    for compressor_class in get_compressors():
+        if accepted.get(compressor_class.encoding, wildcard) > 0:
+            return compressor_class
+    return None
+
+
+def get_compressor(compressor_class):
+    return compressor_class(settings.COMPRESSION_LEVELS[compressor_class.encoding])
+
+
+def get_min_size(content_type):
+    """
+    Minimum body size worth compressing for `content_type`, or None when
+    the type isn't compressed at all.
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    return settings.COMPRESSION_MIN_SIZES.get(media_type)
+
+
+class CompressionStats:
+    """
+    Per-process byte counters for each content coding.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(lambda: {"responses": 0, "original": 0, "sent": 0})
+
+    def record(self, encoding, original, sent, responses=0):
+        with self.lock:
+            counter = self.counters[encoding]
+            counter["responses"] += responses
+            counter["original"] += original
+            counter["sent"] += sent
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                encoding: {**counter, "saved": counter["original"] - counter["sent"]}
+                for encoding, counter in self.counters.items()
+            }
+
+
+compression_stats = CompressionStats()
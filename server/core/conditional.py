@@ -0,0 +1,79 @@
+from django.db.models import Count, Max, Subquery
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from .models import CustomModel
+from .schema import RELATED, get_model_schema
+from .versions import get_model_versions
+import hashlib
+
+
+def get_related_models(model):
+    """
+    CustomModels whose display names end up in `model`'s list responses.
+    """
+    related_models = []
+    for kind, field, name, choices in get_model_schema(model).related_fields:
+        rel_model = field.related_model
+        if kind != RELATED or not issubclass(rel_model, CustomModel):
+            continue
+        if rel_model not in related_models:
+            related_models.append(rel_model)
+    return related_models
+
+
+def compute_etag(request, queryset, related_models=()):
+    """
+    Cheap validator for a response built from `queryset`: row count and
+    latest updated_at of the rows (and of `related_models`), the model
+    version counters, the normalized query params and the negotiated media
+    type. The counters catch what the aggregates can't see, like deleted
+    related rows and many-to-many changes.
+    """
+    aggregates = {"count": Count("pk"), "last": Max("updated_at")}
+    for index, rel_model in enumerate(related_models):
+        latest = rel_model.objects.order_by("-updated_at").values("updated_at")[:1]
+        aggregates[f"related_{index}"] = Max(Subquery(latest))
+    values = queryset.order_by().aggregate(**aggregates)
+
+    signature = [
+        request.path,
+        sorted(request.query_params.lists()),
+        getattr(request, "accepted_media_type", None),
+        sorted(values.items()),
+        get_model_versions(queryset.model, *related_models),
+    ]
+    digest = hashlib.sha1(repr(signature).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(etag, header):
+    """
+    Weak comparison against an If-None-Match header, so the W/ ETags of
+    compressed responses still revalidate.
+    """
+    if not etag or not header:
+        return False
+    etags = [tag.removeprefix("W/") for tag in parse_etags(header)]
+    return "*" in etags or etag.removeprefix("W/") in etags
+
+
+class ConditionalGetMixin:
+    """
+    Answers If-None-Match with 304 before any serialization happens and
+    stamps the ETag on successful responses.
+    """
+
+    etag = None
+
+    def check_not_modified(self, queryset, related_models=()):
+        self.etag = compute_etag(self.request, queryset, related_models)
+        if etag_matches(self.etag, self.request.headers.get("If-None-Match")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.etag and response.status_code in (200, 304):
+            response["ETag"] = self.etag
+        return response
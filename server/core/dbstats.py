@@ -0,0 +1,67 @@
+from collections import defaultdict
+from django.db import connections
+import threading
+
+
+class ConnectionStats:
+    """
+    Per-process count of database connections opened, per alias. With
+    persistent connections this should stay near the number of workers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.opened = defaultdict(int)
+
+    def record_opened(self, alias):
+        with self.lock:
+            self.opened[alias] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.opened)
+
+
+connection_stats = ConnectionStats()
+
+
+def get_pool_stats(pool):
+    stats = pool.get_stats()
+    size = stats.get("pool_size", 0)
+    available = stats.get("pool_available", 0)
+    return {
+        "size": size,
+        "min_size": stats.get("pool_min", 0),
+        "max_size": stats.get("pool_max", 0),
+        "in_use": size - available,
+        "available": available,
+        "waiting": stats.get("requests_waiting", 0),
+        "requests": stats.get("requests_num", 0),
+        "queued": stats.get("requests_queued", 0),
+        "wait_ms": stats.get("requests_wait_ms", 0),
+        "errors": stats.get("requests_errors", 0),
+        "connect_ms": stats.get("connections_ms", 0),
+        "connections_lost": stats.get("connections_lost", 0),
+    }
+
+
+def get_database_stats():
+    """
+    Pool or persistent-connection stats for every configured database.
+    """
+    opened = connection_stats.snapshot()
+    databases = {}
+    for alias in connections:
+        wrapper = connections[alias]
+        settings_dict = wrapper.settings_dict
+        stats = {
+            "vendor": wrapper.vendor,
+            "conn_max_age": settings_dict["CONN_MAX_AGE"],
+            "health_checks": settings_dict["CONN_HEALTH_CHECKS"],
+            "connections_opened": opened.get(alias, 0),
+        }
+        pool = getattr(wrapper, "pool", None)
+        if pool is not None:
+            stats["pool"] = get_pool_stats(pool)
+        databases[alias] = stats
+    return databases
@@ -0,0 +1,166 @@
+from collections import defaultdict
+from django.core.exceptions import FieldDoesNotExist
+from functools import lru_cache
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from .relations import get_m2m_columns
+
+# DRF fields whose to_representation only looks at the raw column value
+VALUE_FIELD_TYPES = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.DateField,
+    serializers.DateTimeField,
+    serializers.DecimalField,
+    serializers.DurationField,
+    serializers.EmailField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    serializers.JSONField,
+    serializers.SlugField,
+    serializers.TimeField,
+    serializers.URLField,
+    serializers.UUIDField,
+)
+
+VALUE = "value"
+RELATED = "related"
+MANY = "many"
+
+
+class FastField:
+    def __init__(self, name, kind, field, model_field):
+        self.name = name
+        self.kind = kind
+        # Bound DRF field, reused for its to_representation
+        self.field = field
+        self.model_field = model_field
+        self.attname = model_field.attname if kind != MANY else None
+
+
+@lru_cache(maxsize=None)
+def get_fast_fields(serializer_class):
+    """
+    Returns the FastFields of a serializer whose output can be built straight
+    from values() rows, or None when it needs the regular DRF path (custom
+    methods, nested serializers, file fields, dotted sources...).
+    """
+    if (
+        serializer_class.to_representation
+        is not serializers.ModelSerializer.to_representation
+    ):
+        return None
+
+    model = serializer_class.Meta.model
+    fast_fields = []
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, ManyRelatedField):
+            kind = MANY
+            relation = field.child_relation
+        elif isinstance(field, PrimaryKeyRelatedField):
+            kind = RELATED
+            relation = field
+        elif type(field) in VALUE_FIELD_TYPES:
+            kind = VALUE
+            relation = None
+        else:
+            return None
+        if relation is not None and (
+            type(relation) is not PrimaryKeyRelatedField or relation.pk_field
+        ):
+            return None
+
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if kind == MANY and not (model_field.many_to_many and model_field.concrete):
+            return None
+        if kind != MANY and not model_field.concrete:
+            return None
+        fast_fields.append(FastField(name, kind, field, model_field))
+    return fast_fields
+
+
+def get_fast_serializer(serializer_class, fields=None):
+    """
+    The FastFields to render for a request, limited to the sparse `fields`,
+    or None when the fast path doesn't apply.
+    """
+    fast_fields = get_fast_fields(serializer_class)
+    if fast_fields is None:
+        return None
+    return [f for f in fast_fields if fields is None or f.name in fields]
+
+
+def get_values_queryset(queryset, fast_fields):
+    pk = queryset.model._meta.pk.attname
+    names = [f.attname for f in fast_fields if f.kind != MANY]
+    if pk not in names:
+        names.insert(0, pk)
+    return queryset.prefetch_related(None).values(*names)
+
+
+def get_m2m_ordering(through, target):
+    """
+    Orders through-table rows the way the related manager orders its
+    objects: by the target model's Meta.ordering, then by the target pk.
+    """
+    field = through._meta.get_field(target)
+    ordering = []
+    for name in field.related_model._meta.ordering:
+        if not isinstance(name, str) or name == "?":
+            continue
+        prefix = "-" if name.startswith("-") else ""
+        ordering.append(f"{prefix}{field.name}__{name.lstrip('-')}")
+    return [*ordering, target]
+
+
+def fetch_many_values(model, fast_fields, pks):
+    """
+    Returns {field name: {pk: [related pks]}} with one through-table query
+    per many-to-many field, in the order DRF would list them.
+    """
+    many_values = {}
+    for fast_field in fast_fields:
+        if fast_field.kind != MANY:
+            continue
+        through, source, target = get_m2m_columns(fast_field.model_field)
+        rows = (
+            through._default_manager.filter(**{f"{source}__in": pks})
+            .order_by(*get_m2m_ordering(through, target))
+            .values_list(source, target)
+        )
+        values = defaultdict(list)
+        for pk, related_pk in rows:
+            values[pk].append(related_pk)
+        many_values[fast_field.name] = values
+    return many_values
+
+
+def serialize_rows(model, fast_fields, rows):
+    """
+    Builds the same dicts ModelSerializer(many=True).data would, from
+    values() rows.
+    """
+    rows = list(rows)
+    pk = model._meta.pk.attname
+    many_values = fetch_many_values(model, fast_fields, [row[pk] for row in rows])
+
+    data = []
+    for row in rows:
+        item = {}
+        for fast_field in fast_fields:
+            if fast_field.kind == MANY:
+                item[fast_field.name] = many_values[fast_field.name].get(row[pk], [])
+                continue
+            value = row[fast_field.attname]
+            if value is None or fast_field.kind == RELATED:
+                item[fast_field.name] = value
+            else:
+                item[fast_field.name] = fast_field.field.to_representation(value)
+        data.append(item)
+    return data
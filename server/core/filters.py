@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.db.models import Q
+from functools import lru_cache
+from lzstring import LZString
+from .search import build_search_q
+import json
+
+
+def decode_query_param(encoded_param):
+    lz = LZString()
+    return json.loads(lz.decompressFromEncodedURIComponent(encoded_param))
+
+
+@lru_cache(maxsize=None)
+def get_model_field_names(model):
+    return frozenset(f.name for f in model._meta.get_fields())
+
+
+class FilterPlan:
+    """
+    Pre-built filter/search/exclude arguments for one model and query.
+    Plans are immutable once compiled and shared between requests.
+    """
+
+    def __init__(
+        self, filter_kwargs, exclude_kwargs, search_q, rank=None, params=None
+    ):
+        self.filter_kwargs = filter_kwargs
+        self.exclude_kwargs = exclude_kwargs
+        self.search_q = search_q
+        # Relevance expression for `__search` params, None without a ranker
+        self.rank = rank
+        # Decoded `q` payload, None when the plan came from plain query params
+        self.params = params
+
+    def apply(self, queryset):
+        queryset = (
+            queryset.filter(**self.filter_kwargs)
+            .filter(self.search_q)
+            .exclude(**self.exclude_kwargs)
+        )
+        if self.rank is not None:
+            queryset = queryset.annotate(search_rank=self.rank)
+        return queryset
+
+
+def build_filter_plan(model, params):
+    filter_kwargs = {}
+    exclude_kwargs = {}
+    search_q = Q()
+    ranks = []
+    model_fields = get_model_field_names(model)
+    for key, value in params.items():
+        base_key = key.split("__")[0]
+        if base_key not in model_fields:
+            continue
+        if "__search" in key:
+            field_name = key.replace("__search", "")
+            q, rank = build_search_q(model, field_name, value)
+            search_q &= q
+            if rank is not None:
+                ranks.append(rank)
+        elif "__not_" in key:
+            actual_key = key.replace("__not_", "__")
+            if actual_key.endswith("__in"):
+                exclude_kwargs[actual_key] = value.split(",")
+            else:
+                exclude_kwargs[actual_key] = value
+        else:
+            if key.endswith("__in"):
+                filter_kwargs[key] = value.split(",")
+            else:
+                filter_kwargs[key] = value
+    rank = sum(ranks[1:], ranks[0]) if ranks else None
+    return FilterPlan(filter_kwargs, exclude_kwargs, search_q, rank)
+
+
+@lru_cache(maxsize=settings.FILTER_PLAN_CACHE_SIZE)
+def _compile_encoded_plan(model, encoded):
+    decoded_params = decode_query_param(encoded)
+    plan = build_filter_plan(model, decoded_params)
+    plan.params = decoded_params
+    return plan
+
+
+@lru_cache(maxsize=settings.FILTER_PLAN_CACHE_SIZE)
+def _compile_params_plan(model, items):
+    return build_filter_plan(model, dict(items))
+
+
+def get_filter_plan(model, params):
+    """
+    Returns the cached FilterPlan for `params`, keyed by the raw `q` string
+    when present, otherwise by the filter-relevant query params.
+    """
+    encoded = params.get("q", None)
+    if encoded:
+        try:
+            return _compile_encoded_plan(model, encoded)
+        except Exception as e:
+            print("Decoding failed:", e)
+
+    model_fields = get_model_field_names(model)
+    items = tuple(
+        (key, value)
+        for key, value in params.items()
+        if key.split("__")[0] in model_fields
+    )
+    return _compile_params_plan(model, items)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from core.tombstones import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Deletes tombstones older than TOMBSTONE_RETENTION_DAYS in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=None,
+            help="Rows deleted per statement (defaults to TOMBSTONE_PRUNE_CHUNK_SIZE).",
+        )
+
+    def handle(self, *args, chunk_size=None, **options):
+        deleted = prune_tombstones(chunk_size)
+        self.stdout.write(f"Deleted {deleted} tombstones")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from core.tokens import get_token_table_stats, sweep_expired_tokens
+
+
+class Command(BaseCommand):
+    help = "Deletes expired knox tokens in chunks and reports the token table size."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=None,
+            help="Tokens deleted per statement (defaults to TOKEN_SWEEP_CHUNK_SIZE).",
+        )
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Only report the table size without deleting anything.",
+        )
+
+    def handle(self, *args, chunk_size=None, stats=False, **options):
+        if not stats:
+            deleted = sweep_expired_tokens(chunk_size)
+            self.stdout.write(f"Deleted {deleted} expired tokens")
+        table = get_token_table_stats()
+        self.stdout.write(
+            f"{table['total']} tokens ({table['expired']} expired) "
+            f"for {table['users']} users"
+        )
@@ -1,8 +1,141 @@
-class CsrfExemptMobileMiddleware:
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from djangorestframework_camel_case.settings import api_settings
+from djangorestframework_camel_case.util import underscoreize
+from django.utils.cache import patch_vary_headers
+from .compression import (
+    choose_compressor,
+    compression_stats,
+    get_compressor,
+    get_min_size,
+)
+
+
+class HybridMiddleware:
+    """
+    Base for middleware that runs natively under both WSGI and ASGI, so an
+    async request path never hops to a thread just to pass through it.
+    Subclasses implement process_request and/or process_response.
+    """
+
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.process_request(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        return self.process_response(request, await self.get_response(request))
+
+    def process_request(self, request):
+        pass
+
+    def process_response(self, request, response):
+        return response
+
+
+class CsrfExemptMobileMiddleware(HybridMiddleware):
+    def process_request(self, request):
         if request.headers.get("X-From-Mobile") == "true":
             setattr(request, "_dont_enforce_csrf_checks", True)
-        return self.get_response(request)
+
+
+class CamelCaseQueryMiddleware(HybridMiddleware):
+    """
+    djangorestframework_camel_case's CamelCaseMiddleWare (snake_case query
+    params) without forcing async requests through a sync adapter.
+    """
+
+    def process_request(self, request):
+        request.GET = underscoreize(request.GET, **api_settings.JSON_UNDERSCOREIZE)
+
+
+class CompressionMiddleware(HybridMiddleware):
+    """
+    Compresses responses with the best coding the client accepts (zstd, br
+    or gzip, depending on what is installed), skipping bodies too small for
+    their content type to be worth it. Streaming responses are flushed per
+    chunk so rows still reach the client as they're produced.
+    """
+
+    def process_response(self, request, response):
+        if request.method == "HEAD" or response.status_code != 200:
+            return response
+        if response.has_header("Content-Encoding"):
+            return response
+        if "no-transform" in response.get("Cache-Control", "").lower():
+            return response
+
+        min_size = get_min_size(response.get("Content-Type", ""))
+        if min_size is None:
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        compressor_class = choose_compressor(
+            request.headers.get("Accept-Encoding", "")
+        )
+        if compressor_class is None:
+            return response
+
+        if response.streaming:
+            self.compress_stream(response, compressor_class)
+        else:
+            content = response.content
+            if len(content) < min_size:
+                return response
+            compressor = get_compressor(compressor_class)
+            compressed = compressor.compress(content) + compressor.finish()
+            if len(compressed) >= len(content):
+                return response
+            compression_stats.record(
+                compressor_class.encoding, len(content), len(compressed), responses=1
+            )
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        # The representation changed, so the ETag can only match weakly
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = f"W/{etag}"
+        response["Content-Encoding"] = compressor_class.encoding
+        return response
+
+    def compress_stream(self, response, compressor_class):
+        compressor = get_compressor(compressor_class)
+        encoding = compressor_class.encoding
+        chunks = response.streaming_content
+
+        def compress_chunk(chunk):
+            compressed = compressor.compress(chunk) + compressor.flush()
+            compression_stats.record(encoding, len(chunk), len(compressed))
+            return compressed
+
+        def finish():
+            compressed = compressor.finish()
+            compression_stats.record(encoding, 0, len(compressed), responses=1)
+            return compressed
+
+        if response.is_async:
+
+            async def compressed_chunks():
+                async for chunk in chunks:
+                    yield compress_chunk(chunk)
+                yield finish()
+
+        else:
+
+            def compressed_chunks():
+                for chunk in chunks:
+                    yield compress_chunk(chunk)
+                yield finish()
+
+        response.streaming_content = compressed_chunks()
+        del response["Content-Length"]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:09
+
+import core.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_alter_setting_created_at_alter_setting_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', core.fields.ShortCharField(blank=True, default='', max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', core.fields.AutoCreatedAtField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'deleted_at'], name='core_tombst_model_d38920_idx')],
+            },
+        ),
+    ]
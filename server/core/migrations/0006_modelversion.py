@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:03
+
+import core.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_tombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', core.fields.ShortCharField(blank=True, default='', max_length=50, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -52,3 +52,33 @@ class Setting(CustomModel):
                     f"{k} must be greater than previous non-empty goal."
                 )
             last_value = val
+
+
+class Tombstone(models.Model):
+    """
+    Records the id of every deleted CustomModel row so clients can drop it
+    on their next delta sync.
+    """
+
+    model = fields.ShortCharField()
+    object_id = models.BigIntegerField()
+    deleted_at = fields.AutoCreatedAtField()
+
+    class Meta:
+        indexes = [models.Index(fields=["model", "deleted_at"])]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id}"
+
+
+class ModelVersion(models.Model):
+    """
+    Counter bumped whenever a model (or one it embeds) is written to. Kept
+    in the database so every worker retires cached responses together.
+    """
+
+    model = fields.ShortCharField(unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.model} v{self.version}"
@@ -1,104 +1,306 @@
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from django.db.models import DateTimeField, DateField, TimeField
-from core.fields import AmountField
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import F, Q, QuerySet
+from django.utils.functional import cached_property
+from core.relations import get_row_value, load_fields, resolve_related_names
+from core.schema import RELATED, get_model_schema
+from datetime import date, datetime, time
+from decimal import Decimal
+import base64
+import json
 import math
 
 
-def to_camel_case(s):
-    parts = s.split("_")
-    return parts[0] + "".join(p.capitalize() for p in parts[1:])
+def cursor_value(value):
+    # isoformat keeps microseconds, which DjangoJSONEncoder would truncate
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values, reverse=False):
+    data = {"v": [cursor_value(v) for v in values], "r": int(reverse)}
+    raw = json.dumps(data)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(encoded):
+    raw = base64.urlsafe_b64decode(encoded.encode("ascii")).decode("utf-8")
+    data = json.loads(raw)
+    return data["v"], bool(data.get("r"))
+
+
+def keyset_q(ordering, values, reverse=False, index=0):
+    """
+    Builds the lexicographic condition for rows that come after (or before,
+    when `reverse`) a row whose ordering columns hold `values`.
+    NULLs always sort last in the forward direction.
+    """
+    name, descending = ordering[index]
+    value = values[index]
+    tail = None
+    if index + 1 < len(ordering):
+        tail = keyset_q(ordering, values, reverse, index + 1)
+
+    if value is None:
+        if reverse:
+            before = Q(**{f"{name}__isnull": False})
+            return before | (Q(**{f"{name}__isnull": True}) & tail) if tail else before
+        return Q(**{f"{name}__isnull": True}) & tail if tail else Q(pk__in=[])
+
+    lookup = "lt" if descending != reverse else "gt"
+    condition = Q(**{f"{name}__{lookup}": value})
+    if not reverse:
+        condition |= Q(**{f"{name}__isnull": True})
+    if tail:
+        condition |= Q(**{name: value}) & tail
+    return condition
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator that trusts PostgreSQL's planner statistics instead of running
+    COUNT(*) once a table is larger than APPROXIMATE_COUNT_THRESHOLD:
+    pg_class.reltuples for unfiltered lists, the EXPLAIN row estimate for
+    filters that still match at least that many rows.
+    """
+
+    approximate = False
+
+    def get_estimate(self):
+        queryset = self.object_list
+        threshold = settings.APPROXIMATE_COUNT_THRESHOLD
+        connection = connections[queryset.db]
+        if not threshold or connection.vendor != "postgresql":
+            return None
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            # reltuples is -1 until the table has been analyzed
+            if not row or row[0] < threshold:
+                return None
+            if not queryset.query.where:
+                return int(row[0])
+
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = plan[0]["Plan"]["Plan Rows"]
+        return int(estimate) if estimate >= threshold else None
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            estimate = self.get_estimate()
+            if estimate is not None:
+                self.approximate = True
+                return estimate
+        return super().count
+
+    def validate_number(self, number):
+        # An estimate can undershoot, so pages past it are not rejected
+        if self.count is None or not self.approximate:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages["invalid_page"])
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.approximate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        page = self.object_list[bottom : bottom + self.per_page]
+        return self._get_page(page, number, self)
 
 
 class CustomPagination(PageNumberPagination):
+    django_paginator_class = ApproximateCountPaginator
     page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
 
     def __init__(self, *args, **kwargs):
         self.model = None
+        # Sparse fieldset of the request, None when every field is returned
+        self.fields = None
+        self.cursor_mode = False
         super().__init__(*args, **kwargs)
 
-    def get_paginated_response(self, data):
-        total_pages = math.ceil(
-            self.page.paginator.count / self.page.paginator.per_page
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            return self.paginate_queryset_by_cursor(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_cursor_ordering(self, queryset):
+        ordering = []
+        for item in queryset.query.order_by or ["-id"]:
+            if not isinstance(item, str):
+                raise ValidationError({"order_by": "Unsupported ordering for cursor."})
+            descending = item.startswith("-")
+            name = item.lstrip("-")
+            try:
+                field = queryset.model._meta.get_field(
+                    "id" if name == "pk" else name
+                )
+            except FieldDoesNotExist:
+                field = None
+            if field is None or not field.concrete or field.many_to_many:
+                raise ValidationError({"order_by": f"Cannot use {name} with cursor."})
+            ordering.append((field.attname, descending))
+
+        # The primary key keeps the ordering total
+        if not any(name == "id" for name, _ in ordering):
+            ordering.append(("id", ordering[-1][1] if ordering else True))
+        return ordering
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        self.cursor_mode = True
+        self.request = request
+        page_size = self.get_page_size(request)
+        ordering = self.get_cursor_ordering(queryset)
+        queryset = load_fields(queryset, [name for name, _ in ordering])
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        values, reverse = None, False
+        if encoded:
+            try:
+                values, reverse = decode_cursor(encoded)
+            except Exception:
+                raise ValidationError({"cursor": self.invalid_cursor_message})
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValidationError({"cursor": self.invalid_cursor_message})
+
+        # Walking backwards flips every column, including where NULLs land
+        nulls = {"nulls_first": True} if reverse else {"nulls_last": True}
+        order_exprs = []
+        for name, descending in ordering:
+            if descending != reverse:
+                order_exprs.append(F(name).desc(**nulls))
+            else:
+                order_exprs.append(F(name).asc(**nulls))
+        queryset = queryset.order_by(*order_exprs)
+
+        if values is not None:
+            queryset = queryset.filter(keyset_q(ordering, values, reverse))
+
+        rows = list(queryset[: page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        self.cursor_ordering = ordering
+        self.has_next = has_more if not reverse else True
+        self.has_previous = bool(encoded) if not reverse else has_more
+        return rows
+
+    def get_cursor_link(self, obj, reverse):
+        url = remove_query_param(self.request.build_absolute_uri(), "page")
+        values = [get_row_value(obj, name) for name, _ in self.cursor_ordering]
+        return replace_query_param(
+            url, self.cursor_query_param, encode_cursor(values, reverse)
         )
 
+    def get_next_cursor_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_cursor_link(self.page[-1], False)
+
+    def get_previous_cursor_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_cursor_link(self.page[0], True)
+
+    def get_field_metadata(self, objects):
+        if not self.model:
+            return {}, []
+
+        schema = get_model_schema(self.model)
+        related_names = resolve_related_names(self.model, objects, self.fields)
+        related = []
+        for kind, field, name, choices in schema.related_fields:
+            if self.fields is not None and field.name not in self.fields:
+                continue
+            if kind == RELATED:
+                related.extend(
+                    [
+                        {"field": name, "id": pk, "name": rel_name}
+                        for pk, rel_name in related_names[field.name]
+                    ]
+                )
+            else:
+                values = set()
+                for obj in objects:
+                    raw_value = get_row_value(obj, field.name)
+                    if raw_value is not None:
+                        values.add(raw_value)
+                related.extend(
+                    [
+                        {"field": name, "id": val, "name": choices.get(val, str(val))}
+                        for val in values
+                    ]
+                )
+
+        # Clients holding the current schema version don't need it resent
+        metadata = {"schema_version": schema.version}
+        if self.request.query_params.get("schema_version") != schema.version:
+            metadata.update(schema.fields)
+        return metadata, related
+
+    def get_paginated_response(self, data):
         ids = [
             item.get("id") for item in data if isinstance(item, dict) and "id" in item
         ]
+        metadata, related = self.get_field_metadata(self.page)
 
-        related = []
-        related_fields = []
-        option_fields = []
-        datetime_fields = []
-        date_fields = []
-        price_fields = []
-        time_fields = []
-        if self.model:
-            for field in self.model._meta.get_fields():
-                field_name = field.name
-                values = set()
-                if field.is_relation and field.many_to_one or field.many_to_many:
-                    related_fields.append(to_camel_case(field.name))
-                    values = set()
-
-                    for obj in self.page:
-                        value = getattr(obj, field_name, None)
-                        if not value:
-                            continue
-                        if field.many_to_one:
-                            values.add(value)
-                        elif field.many_to_many:
-                            for rel in value.all():
-                                values.add(rel)
-
-                    related.extend(
-                        [
-                            {
-                                "field": to_camel_case(field_name),
-                                "id": rel.pk,
-                                "name": str(rel),
-                            }
-                            for rel in values
-                        ]
-                    )
-                elif getattr(field, "choices", None):
-                    option_fields.append(to_camel_case(field.name))
-                    for obj in self.page:
-                        raw_value = getattr(obj, field_name, None)
-                        if raw_value is not None:
-                            values.add(raw_value)
-
-                    related.extend(
-                        [
-                            {
-                                "field": to_camel_case(field_name),
-                                "id": val,
-                                "name": dict(field.choices).get(val, str(val)),
-                            }
-                            for val in values
-                        ]
-                    )
-                elif isinstance(field, DateTimeField):
-                    datetime_fields.append(to_camel_case(field.name))
-                elif isinstance(field, DateField):
-                    date_fields.append(to_camel_case(field.name))
-                elif isinstance(field, TimeField):
-                    time_fields.append(to_camel_case(field.name))
-                elif isinstance(field, AmountField):
-                    price_fields.append(to_camel_case(field.name))
+        if self.cursor_mode:
+            return Response(
+                {
+                    "count": None,
+                    "current_page": None,
+                    "total_pages": None,
+                    "next": self.get_next_cursor_link(),
+                    "previous": self.get_previous_cursor_link(),
+                    "ids": ids,
+                    **metadata,
+                    "results": data,
+                    "related": related,
+                }
+            )
+
+        total_pages = math.ceil(
+            self.page.paginator.count / self.page.paginator.per_page
+        )
         return Response(
             {
                 "count": self.page.paginator.count,
+                "count_is_approximate": self.page.paginator.approximate,
                 "current_page": self.page.number,
                 "total_pages": total_pages,
                 "next": self.get_next_link(),
                 "previous": self.get_previous_link(),
                 "ids": ids,
-                "related_fields": related_fields,
-                "option_fields": option_fields,
-                "date_fields": date_fields,
-                "datetime_fields": datetime_fields,
-                "price_fields": price_fields,
+                **metadata,
                 "results": data,
                 "related": related,
             }
@@ -0,0 +1,87 @@
+from django.conf import settings
+from djangorestframework_camel_case.settings import api_settings
+from djangorestframework_camel_case.util import get_underscoreize_re, underscoreize
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+import json
+import msgpack
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Unknown keys stop being memoized past this many entries
+SNAKE_KEY_CACHE_SIZE = 10000
+
+SNAKE_KEYS = {}
+
+
+def snake_key(key, underscoreize_re):
+    """
+    camelCase -> snake_case with djangorestframework_camel_case's rules,
+    memoized per key.
+    """
+    try:
+        return SNAKE_KEYS[key]
+    except KeyError:
+        pass
+    new_key = underscoreize_re.sub(r"\1_\2", key).lower()
+    if len(SNAKE_KEYS) < SNAKE_KEY_CACHE_SIZE:
+        SNAKE_KEYS[key] = new_key
+    return new_key
+
+
+def fast_underscoreize(data, underscoreize_re):
+    if isinstance(data, dict):
+        return {
+            (
+                snake_key(key, underscoreize_re) if isinstance(key, str) else key
+            ): fast_underscoreize(value, underscoreize_re)
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [fast_underscoreize(item, underscoreize_re) for item in data]
+    return data
+
+
+class CamelCaseJSONParser(JSONParser):
+    """
+    Drop-in for djangorestframework_camel_case's parser with memoized key
+    conversion, decoding with orjson when it is installed.
+    """
+
+    json_underscoreize = api_settings.JSON_UNDERSCOREIZE
+    underscoreize_re = get_underscoreize_re(json_underscoreize)
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+
+        try:
+            raw = stream.read().decode(encoding)
+            data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+        except ValueError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
+
+        options = self.json_underscoreize
+        if options.get("ignore_fields") or options.get("ignore_keys"):
+            return underscoreize(data, **options)
+        return fast_underscoreize(data, self.underscoreize_re)
+
+
+class CamelCaseMessagePackParser(BaseParser):
+    """
+    Parses `application/msgpack` bodies into the same snake_case data the
+    JSON parser produces.
+    """
+
+    media_type = "application/msgpack"
+    underscoreize_re = CamelCaseJSONParser.underscoreize_re
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            data = msgpack.unpackb(stream.read(), raw=False, timestamp=3)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError("MessagePack parse error - %s" % str(exc))
+        return fast_underscoreize(data, self.underscoreize_re)
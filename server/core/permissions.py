@@ -1,11 +1,58 @@
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
 from rest_framework.permissions import (
     DjangoModelPermissions,
 )
-import copy
+from .versions import get_local_model_version
+
+
+def get_user_permissions(user):
+    """
+    The user's "app_label.codename" permissions, cached per user. Changes to
+    user, group or permission relations bump the Permission version, which
+    retires every entry at once (in other workers once their local copy of
+    the version expires).
+    """
+    version = get_local_model_version(Permission)
+    key = f"user-permissions:{user.pk}:{version}"
+    permissions = cache.get(key)
+    if permissions is None:
+        permissions = frozenset(user.get_all_permissions())
+        cache.set(key, permissions, settings.PERMISSION_CACHE_TIMEOUT)
+    return permissions
+
+
+def user_has_perms(user, perms):
+    """
+    Same answer as `user.has_perms(perms)` without querying the permission
+    tables on warm requests.
+    """
+    if not user.is_active:
+        return False
+    if user.is_superuser:
+        return True
+    return set(perms) <= get_user_permissions(user)
 
 
 class CustomDjangoModelPermission(DjangoModelPermissions):
+    perms_map = {
+        **DjangoModelPermissions.perms_map,
+        "GET": ["%(app_label)s.view_%(model_name)s"],
+    }
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not user or (not user.is_authenticated and self.authenticated_users_only):
+            return False
+
+        # Workaround to ensure DjangoModelPermissions are not applied
+        # to the root view when using DefaultRouter.
+        if getattr(view, "_ignore_model_permissions", False):
+            return True
 
-    def __init__(self):
-        self.perms_map = copy.deepcopy(self.perms_map)
-        self.perms_map["GET"] = ["%(app_label)s.view_%(model_name)s"]
+        queryset = getattr(view, "queryset", None)
+        if queryset is None:
+            queryset = self._queryset(view)
+        perms = self.get_required_permissions(request.method, queryset.model)
+        return user_has_perms(user, perms)
@@ -0,0 +1,196 @@
+from collections import defaultdict
+from djangorestframework_camel_case.util import camel_to_underscore
+from functools import lru_cache
+from rest_framework.relations import ManyRelatedField, RelatedField
+from .models import CustomModel
+
+
+class RelationPlan:
+    def __init__(self, select_related, prefetch_related, only):
+        self.select_related = select_related
+        self.prefetch_related = prefetch_related
+        # None when the serializer reads every concrete column
+        self.only = only
+
+
+@lru_cache(maxsize=None)
+def get_serializer_field_names(serializer_class):
+    return tuple(serializer_class().fields)
+
+
+def get_sparse_fields(serializer_class, fields=None, omit=None):
+    """
+    Resolves comma-separated `fields`/`omit` params, in camelCase or
+    snake_case, to the serializer fields to keep. `id` is always kept.
+    Raises ValueError naming any unknown field.
+    """
+
+    def parse(value):
+        return {camel_to_underscore(name.strip()) for name in value.split(",")} - {""}
+
+    available = set(get_serializer_field_names(serializer_class))
+    keep = parse(fields) if fields else set(available)
+    omitted = parse(omit) if omit else set()
+    unknown = (keep | omitted) - available
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+    return frozenset((keep - omitted) | ({"id"} & available))
+
+
+def load_fields(queryset, names):
+    """
+    Makes sure a projected queryset still loads `names`, so reading them
+    later doesn't cost a query per row.
+    """
+    values_select = queryset.query.values_select
+    if values_select:
+        missing = [name for name in names if name not in values_select]
+        return queryset.values(*values_select, *missing) if missing else queryset
+    field_names, deferred = queryset.query.deferred_loading
+    if deferred and field_names & set(names):
+        return queryset.defer(None).defer(*(field_names - set(names)))
+    if not deferred and field_names:
+        return queryset.only(*field_names, *names)
+    return queryset
+
+
+@lru_cache(maxsize=256)
+def get_relation_plan(model, serializer_class, fields=None):
+    """
+    Works out, once per model/serializer pair, which relations the serializer
+    touches: FKs it follows past the primary key, M2M managers it lists, and
+    the columns it actually reads. `fields` limits the plan to a sparse
+    fieldset.
+    """
+    forward_fks = {
+        f.name for f in model._meta.concrete_fields if f.many_to_one or f.one_to_one
+    }
+    concrete = {f.name for f in model._meta.concrete_fields}
+    select_related = []
+    prefetch_related = []
+    only = {model._meta.pk.name}
+    for name, field in serializer_class().fields.items():
+        if field.write_only or field.source == "*":
+            continue
+        if fields is not None and name not in fields:
+            continue
+        source = field.source.split(".")[0]
+        follows_fk = "." in field.source or (
+            isinstance(field, RelatedField) and not field.use_pk_only_optimization()
+        )
+        if isinstance(field, ManyRelatedField) and source not in prefetch_related:
+            prefetch_related.append(source)
+        elif follows_fk and source in forward_fks and source not in select_related:
+            select_related.append(source)
+        if source in concrete:
+            only.add(source)
+
+    if only >= concrete:
+        only = None
+    else:
+        only = sorted(only)
+    return RelationPlan(select_related, prefetch_related, only)
+
+
+def get_display_fields(model):
+    # Only CustomModel.__str__ can be rebuilt from values(); None otherwise
+    if model.__str__ is not CustomModel.__str__:
+        return None
+    return [f.name for f in model._meta.fields if getattr(f, "display", False)]
+
+
+def fetch_display_names(model, pks):
+    """
+    Returns {pk: str(obj)} for `pks` using a single query.
+    """
+    display_fields = get_display_fields(model)
+    if display_fields is None:
+        foreign_keys = [
+            f.name
+            for f in model._meta.concrete_fields
+            if f.many_to_one or f.one_to_one
+        ]
+        objects = model._default_manager.select_related(*foreign_keys).in_bulk(pks)
+        return {pk: str(obj) for pk, obj in objects.items()}
+
+    names = {}
+    rows = model._default_manager.filter(pk__in=pks).values_list(
+        "pk", *display_fields
+    )
+    for pk, *values in rows:
+        if values:
+            names[pk] = " - ".join(str(value) for value in values)
+        else:
+            names[pk] = f"{model.__name__} object ({pk})"
+    return names
+
+
+def get_m2m_columns(field):
+    """
+    Returns the through model and its (source, target) id columns for a
+    forward ManyToManyField or a reverse ManyToManyRel.
+    """
+    forward = field if field.concrete else field.remote_field
+    through = forward.remote_field.through
+    source = forward.m2m_field_name()
+    target = forward.m2m_reverse_field_name()
+    if not field.concrete:
+        source, target = target, source
+    return (
+        through,
+        through._meta.get_field(source).attname,
+        through._meta.get_field(target).attname,
+    )
+
+
+def get_row_value(obj, name):
+    # Fast-path pages hold values() dicts instead of model instances
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def resolve_related_names(model, objects, fields=None):
+    """
+    Resolves the related objects of `objects` as {field_name: [(pk, name)]}
+    for every FK and M2M field (or only those in `fields`), with one
+    values() query per related model and one through-table query per M2M
+    field.
+    """
+    objects = list(objects)
+    pks = [get_row_value(obj, model._meta.pk.attname) for obj in objects]
+    field_ids = {}
+    wanted = defaultdict(set)
+    for field in model._meta.get_fields():
+        if fields is not None and field.name not in fields:
+            continue
+        if field.is_relation and field.many_to_one:
+            ids = {get_row_value(obj, field.attname) for obj in objects}
+            ids.discard(None)
+        elif field.many_to_many:
+            ids = set()
+            if pks:
+                through, source, target = get_m2m_columns(field)
+                ids = set(
+                    through._default_manager.filter(
+                        **{f"{source}__in": pks}
+                    ).values_list(target, flat=True)
+                )
+        else:
+            continue
+        field_ids[field.name] = (field.related_model, ids)
+        wanted[field.related_model].update(ids)
+
+    names = {
+        related_model: fetch_display_names(related_model, ids)
+        for related_model, ids in wanted.items()
+        if ids
+    }
+    return {
+        field_name: [
+            (pk, names[related_model][pk])
+            for pk in sorted(ids)
+            if pk in names[related_model]
+        ]
+        for field_name, (related_model, ids) in field_ids.items()
+    }
@@ -0,0 +1,139 @@
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from djangorestframework_camel_case.settings import api_settings
+from djangorestframework_camel_case.util import (
+    camelize,
+    camelize_re,
+    underscore_to_camel,
+)
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+import datetime
+import decimal
+import msgpack
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Unknown keys stop being memoized past this many entries
+CAMEL_KEY_CACHE_SIZE = 10000
+
+CAMEL_KEYS = {}
+
+
+def camel_key(key):
+    """
+    snake_case -> camelCase with the same regex rules as
+    djangorestframework_camel_case, memoized per key.
+    """
+    try:
+        return CAMEL_KEYS[key]
+    except KeyError:
+        pass
+    new_key = camelize_re.sub(underscore_to_camel, key) if "_" in key else key
+    if len(CAMEL_KEYS) < CAMEL_KEY_CACHE_SIZE:
+        CAMEL_KEYS[key] = new_key
+    return new_key
+
+
+def prime_camel_keys(keys):
+    for key in keys:
+        camel_key(key)
+
+
+def fast_camelize(data):
+    """
+    Same output as djangorestframework_camel_case's camelize without the
+    ignore options, using plain dicts and the memoized key map.
+    """
+    if isinstance(data, dict):
+        camelized = {}
+        for key, value in data.items():
+            if isinstance(key, Promise):
+                key = force_str(key)
+            if isinstance(key, str):
+                key = camel_key(key)
+            camelized[key] = fast_camelize(value)
+        return camelized
+    if isinstance(data, (list, tuple)):
+        return [fast_camelize(item) for item in data]
+    if data is None or isinstance(data, (str, int, float)):
+        return data
+    if isinstance(data, Promise):
+        return force_str(data)
+    # Everything else iterable (querysets, sets, generators) becomes a list
+    try:
+        items = iter(data)
+    except TypeError:
+        return data
+    return [fast_camelize(item) for item in items]
+
+
+class CamelCaseJSONRenderer(JSONRenderer):
+    """
+    Drop-in for djangorestframework_camel_case's renderer. Keys go through
+    the memoized map and compact output is encoded with orjson when it is
+    installed; anything else falls back to the stock JSON renderer.
+    """
+
+    json_underscoreize = api_settings.JSON_UNDERSCOREIZE
+
+    def camelize(self, data):
+        options = self.json_underscoreize
+        if options.get("ignore_fields") or options.get("ignore_keys"):
+            return camelize(data, **options)
+        return fast_camelize(data)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        data = self.camelize(data)
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if (
+            orjson is None
+            or indent is not None
+            or self.ensure_ascii
+            or not self.compact
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        # Same strict-javascript escaping as the stock renderer
+        return ret.replace("\u2028".encode(), b"\\u2028").replace(
+            "\u2029".encode(), b"\\u2029"
+        )
+
+
+def encode_msgpack_value(obj):
+    # Aware datetimes are packed natively as Timestamp extensions
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, datetime.datetime) and obj.tzinfo is None:
+        return obj.isoformat()
+    return JSONEncoder().default(obj)
+
+
+class CamelCaseMessagePackRenderer(BaseRenderer):
+    """
+    MessagePack with the same camelCase keys as the JSON renderer, for
+    clients sending `Accept: application/msgpack`.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(
+            fast_camelize(data), default=encode_msgpack_value, datetime=True
+        )
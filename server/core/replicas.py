@@ -0,0 +1,109 @@
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+import random
+
+# Replica alias the current request reads from, None for the primary
+replica_alias = ContextVar("replica_alias", default=None)
+
+
+# Backends that keep entries inside one process (or not at all)
+LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def check_write_cache():
+    """
+    Read-your-writes only holds if every worker sees the markers written by
+    the others, so replicas refuse a per-process REPLICA_STICKY_CACHE_ALIAS.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return
+    alias = settings.REPLICA_STICKY_CACHE_ALIAS
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if backend is None or backend in LOCAL_CACHE_BACKENDS:
+        raise ImproperlyConfigured(
+            "DATABASE_REPLICAS needs REPLICA_STICKY_CACHE_ALIAS "
+            f"({alias!r}) to name a cache shared by every worker, "
+            "such as Redis, Memcached or the database cache."
+        )
+
+
+def get_write_key(user):
+    return f"recent-write:{user.pk}"
+
+
+def record_write(user):
+    if user and user.is_authenticated:
+        caches[settings.REPLICA_STICKY_CACHE_ALIAS].set(
+            get_write_key(user), True, settings.REPLICA_STICKY_SECONDS
+        )
+
+
+def has_recent_write(user):
+    if not user or not user.is_authenticated:
+        return False
+    return bool(caches[settings.REPLICA_STICKY_CACHE_ALIAS].get(get_write_key(user)))
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica picked for the current request, if any, and
+    everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        # Related lookups follow the database their instance came from
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaReadMixin:
+    """
+    Serves `replica_actions` from a read replica once the request is
+    authenticated, unless the user wrote something in the last
+    REPLICA_STICKY_SECONDS (read-your-writes). Unsafe requests mark the
+    user as a recent writer.
+    """
+
+    replica_actions = ("list", "retrieve")
+
+    def dispatch(self, request, *args, **kwargs):
+        token = replica_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            replica_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS:
+            record_write(request.user)
+        elif (
+            settings.DATABASE_REPLICAS
+            and self.action in self.replica_actions
+            and not has_recent_write(request.user)
+        ):
+            replica_alias.set(random.choice(settings.DATABASE_REPLICAS))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            # Restart the window so it covers replication of the finished write
+            record_write(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
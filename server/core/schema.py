@@ -0,0 +1,76 @@
+from django.apps import apps
+from django.db.models import DateTimeField, DateField, TimeField
+from functools import lru_cache
+from .fields import AmountField
+from .models import CustomModel
+from .renderers import prime_camel_keys
+from .utils import to_camel_case
+import hashlib
+import json
+
+RELATED = "related"
+OPTION = "option"
+
+
+class ModelSchema:
+    """
+    Field classification the clients need to render a model, computed once
+    per model. `fields` is what the `/schema/<model>` endpoint and the list
+    responses ship; `version` changes whenever it does.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        # (kind, field, camel name, choices) for fields shown in `related`
+        self.related_fields = []
+        self.fields = {
+            "related_fields": [],
+            "option_fields": [],
+            "date_fields": [],
+            "datetime_fields": [],
+            "price_fields": [],
+            "time_fields": [],
+        }
+
+        for field in model._meta.get_fields():
+            name = to_camel_case(field.name)
+            if field.is_relation and field.many_to_one or field.many_to_many:
+                self.fields["related_fields"].append(name)
+                self.related_fields.append((RELATED, field, name, None))
+            elif getattr(field, "choices", None):
+                self.fields["option_fields"].append(name)
+                self.related_fields.append((OPTION, field, name, dict(field.choices)))
+            elif isinstance(field, DateTimeField):
+                self.fields["datetime_fields"].append(name)
+            elif isinstance(field, DateField):
+                self.fields["date_fields"].append(name)
+            elif isinstance(field, TimeField):
+                self.fields["time_fields"].append(name)
+            elif isinstance(field, AmountField):
+                self.fields["price_fields"].append(name)
+
+        raw = json.dumps(self.fields, sort_keys=True).encode("utf-8")
+        self.version = hashlib.sha1(raw).hexdigest()[:12]
+
+
+@lru_cache(maxsize=None)
+def get_model_schema(model):
+    return ModelSchema(model)
+
+
+def get_schema_model(label):
+    """
+    Looks up a CustomModel by its `app_label.model_name` label, or None.
+    """
+    try:
+        model = apps.get_model(label)
+    except (LookupError, ValueError):
+        return None
+    return model if issubclass(model, CustomModel) else None
+
+
+def warm_model_schemas():
+    for model in apps.get_models():
+        if issubclass(model, CustomModel):
+            get_model_schema(model)
+            prime_camel_keys(field.name for field in model._meta.get_fields())
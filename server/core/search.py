@@ -0,0 +1,110 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection
+from django.db.migrations.operations.base import Operation
+from django.db.models import CharField, Q, TextField
+
+
+def icontains_all(field_name, terms):
+    q = Q()
+    for term in terms:
+        q &= Q(**{f"{field_name}__icontains": term})
+    return q
+
+
+def get_search_rank(field_name, value):
+    # Imported lazily so SQLite setups never load the postgres contrib app
+    from django.contrib.postgres.search import (
+        SearchQuery,
+        SearchRank,
+        SearchVector,
+        TrigramWordSimilarity,
+    )
+
+    vector = SearchVector(field_name, config="simple")
+    query = SearchQuery(value, config="simple", search_type="plain")
+    return SearchRank(vector, query) + TrigramWordSimilarity(value, field_name)
+
+
+def build_search_q(model, field_name, value):
+    """
+    Returns (q, rank) for one `<field>__search` param. Every term must match
+    the field; relations match any char field of the related model and
+    choice fields match their labels. On PostgreSQL, text fields also get a
+    rank combining ts_rank and trigram word similarity; the icontains
+    filters there are served by the pg_trgm indexes from AddTrigramIndex.
+    """
+    search_terms = value.split()
+    try:
+        field = model._meta.get_field(field_name)
+    except FieldDoesNotExist:
+        return icontains_all(field_name, search_terms), None
+
+    if field.is_relation:
+        q = Q()
+        rel_model = field.related_model
+        for rel_field in rel_model._meta.get_fields():
+            if isinstance(rel_field, CharField):
+                for term in search_terms:
+                    q |= Q(**{f"{field.name}__{rel_field.name}__icontains": term})
+        return q, None
+
+    if field.choices:
+        matched_values = [
+            val
+            for val, label in field.choices
+            if any(term.lower() in label.lower() for term in search_terms)
+        ]
+        return Q(**{f"{field_name}__in": matched_values}), None
+
+    rank = None
+    if connection.vendor == "postgresql" and isinstance(field, (CharField, TextField)):
+        rank = get_search_rank(field_name, value)
+    return icontains_all(field_name, search_terms), rank
+
+
+class AddTrigramIndex(Operation):
+    """
+    Adds a pg_trgm GIN index matching Django's icontains SQL
+    (UPPER(col::text) LIKE ...). Does nothing outside PostgreSQL.
+    """
+
+    reduces_to_sql = False
+    reversible = True
+
+    def __init__(self, model_name, field_name):
+        self.model_name = model_name
+        self.field_name = field_name
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def get_index_name(self, model):
+        return f"{model._meta.db_table}_{self.field_name}_trgm"[:63]
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        model = to_state.apps.get_model(app_label, self.model_name)
+        column = model._meta.get_field(self.field_name).column
+        quote = schema_editor.quote_name
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote(self.get_index_name(model))} "
+            f"ON {quote(model._meta.db_table)} "
+            f"USING gin ((UPPER({quote(column)}::text)) gin_trgm_ops)"
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        model = from_state.apps.get_model(app_label, self.model_name)
+        schema_editor.execute(
+            f"DROP INDEX IF EXISTS {schema_editor.quote_name(self.get_index_name(model))}"
+        )
+
+    def describe(self):
+        return f"Add trigram index on {self.model_name}.{self.field_name}"
+
+    @property
+    def migration_name_fragment(self):
+        return f"{self.model_name.lower()}_{self.field_name}_trgm"
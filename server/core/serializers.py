@@ -89,7 +89,13 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class CustomSerializer(serializers.ModelSerializer):
-    pass
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldset: drop every field not listed
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     # def __init__(self, *args, **kwargs):
     #     super().__init__(*args, **kwargs)
     #     obj = (
@@ -1,5 +1,12 @@
-from django.db.models.signals import post_migrate
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_migrate, post_delete, post_save
 from django.dispatch import receiver
+from django.contrib.auth.models import Group, Permission, User
+from knox.models import AuthToken
+from .versions import bump_model_version_on_commit
+from .dbstats import connection_stats
+from .tokens import invalidate_tokens
+from .tombstones import pending_tombstones
 from finance.models import *
 from personal.models import *
 from productivity.models import *
@@ -55,3 +62,67 @@ def create_default_accounts(sender, **kwargs):
             fields["parent_goal"] = created_goals.get(parent_id)
         obj, _ = model.objects.get_or_create(id=id, defaults=fields)
         created_goals[id] = obj
+
+
+@receiver(post_delete)
+def record_tombstone(sender, instance, **kwargs):
+    if not issubclass(sender, CustomModel):
+        return
+    tombstone = Tombstone(model=sender._meta.label_lower, object_id=instance.pk)
+    tombstones = pending_tombstones.get()
+    if tombstones is None:
+        tombstone.save()
+    else:
+        tombstones.append(tombstone)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cached_responses(sender, **kwargs):
+    if not issubclass(sender, CustomModel):
+        return
+    bump_model_version_on_commit(sender)
+
+
+@receiver(m2m_changed)
+def invalidate_cached_relations(sender, instance, model, action, **kwargs):
+    if not action.startswith("post_"):
+        return
+    for changed in (type(instance), model):
+        if issubclass(changed, CustomModel):
+            bump_model_version_on_commit(changed)
+
+
+@receiver(post_delete, sender=AuthToken)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_tokens([instance])
+    # Other workers drop their in-process entries when the version moves
+    bump_model_version_on_commit(AuthToken)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, update_fields=None, **kwargs):
+    # Deactivation or profile changes must not be served from cached auth
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    invalidate_tokens(AuthToken.objects.filter(user=instance).only("token_key"))
+    bump_model_version_on_commit(AuthToken)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_permission_relations(sender, action, **kwargs):
+    if action.startswith("post_"):
+        bump_model_version_on_commit(Permission)
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_deleted_permissions(sender, **kwargs):
+    bump_model_version_on_commit(Permission)
+
+
+@receiver(connection_created)
+def count_opened_connection(sender, connection, **kwargs):
+    connection_stats.record_opened(connection.alias)
@@ -0,0 +1,94 @@
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from .asyncviews import in_async_view
+from itertools import batched
+import contextvars
+
+
+async def abatched(rows, size):
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_list_response(renderer, queryset, serialize, chunk_size, extra=None):
+    """
+    Streams a `page=all` list as one JSON document, serializing and rendering
+    `chunk_size` rows at a time so memory stays bounded by the chunk.
+    `extra` keys are written after the usual envelope.
+
+    Views running under an async route (ASYNC_VIEWS) get an async generator
+    reading rows with aiterator(), so a slow client never holds a worker
+    thread. Synchronous callers, like /batch, always get a sync body.
+    """
+    ids = []
+
+    def render_rows(rows):
+        data = serialize(list(rows))
+        ids.extend(item.get("id") for item in data if isinstance(item, dict))
+        # Render the chunk as a list and drop the surrounding brackets
+        return renderer.render(data)[1:-1]
+
+    def render_footer():
+        return b"]," + renderer.render(
+            {
+                "count": len(ids),
+                "current_page": 1,
+                "total_pages": 1,
+                "next": None,
+                "previous": None,
+                "ids": ids,
+                **(extra or {}),
+            }
+        )[1:]
+
+    def generate():
+        first = True
+        yield b'{"results":['
+        for rows in batched(queryset.iterator(chunk_size=chunk_size), chunk_size):
+            body = render_rows(rows)
+            if not body:
+                continue
+            if not first:
+                yield b","
+            first = False
+            yield body
+        yield render_footer()
+
+    async def agenerate():
+        first = True
+        yield b'{"results":['
+        rows = queryset.using(database).aiterator(chunk_size=chunk_size)
+        async for batch in abatched(rows, chunk_size):
+            body = await sync_to_async(context.run)(render_rows, batch)
+            if not body:
+                continue
+            if not first:
+                yield b","
+            first = False
+            yield body
+        yield render_footer()
+
+    # Rows are read after the view returns, so keep its context (and with
+    # it the database the request was routed to)
+    context = contextvars.copy_context()
+    database = queryset.db
+
+    def generate_in_context():
+        chunks = generate()
+        while True:
+            try:
+                yield context.run(next, chunks)
+            except StopIteration:
+                return
+
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type = f"{content_type}; charset={renderer.charset}"
+    streaming_content = agenerate() if in_async_view.get() else generate_in_context()
+    return StreamingHttpResponse(streaming_content, content_type=content_type)
@@ -1,3 +1,958 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models import Q
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from djangorestframework_camel_case import parser as camel_parser
+from djangorestframework_camel_case import render as camel_render
+from knox.models import AuthToken
+from lzstring import LZString
+from rest_framework.test import APIClient
+from finance.models import Account, Category, Receivable, Transaction
+from finance.viewsets import ReceivableViewSet, TransactionViewSet
+from productivity.models import Event, Tag
+from productivity.serializers import ScheduleSerializer
+from productivity.viewsets import EventViewSet
+from .asyncviews import in_async_view
+from .batch import get_response_body
+from .cache import CachedResponseMixin
+from .fastpath import get_fast_fields, get_values_queryset, serialize_rows
+from .filters import get_filter_plan
+from .paginations import ApproximateCountPaginator
+from .parsers import CamelCaseJSONParser, CamelCaseMessagePackParser
+from .renderers import CamelCaseJSONRenderer, CamelCaseMessagePackRenderer
+from . import filters, paginations, parsers, renderers, search
+import gzip
+import json
+import msgpack
+from .serializers import CustomSerializer
+from .replicas import (
+    ReplicaRouter,
+    check_write_cache,
+    has_recent_write,
+    replica_alias,
+)
+from .models import Tombstone
+from .permissions import user_has_perms
+from .streaming import stream_list_response
+from .tombstones import prune_tombstones
+from .versions import get_model_versions, local_versions
+from .tokens import sweep_expired_tokens, token_cache
 
-# Create your tests here.
+
+def get_serializer_classes(base=CustomSerializer):
+    for serializer_class in base.__subclasses__():
+        yield serializer_class
+        yield from get_serializer_classes(serializer_class)
+
+
+class FilterPlanTests(SimpleTestCase):
+    def setUp(self):
+        filters._compile_params_plan.cache_clear()
+        filters._compile_encoded_plan.cache_clear()
+
+    def test_equal_params_share_a_plan(self):
+        plan = get_filter_plan(Transaction, QueryDict("amount__gte=5&page=1"))
+        again = get_filter_plan(Transaction, QueryDict("amount__gte=5&page=2"))
+        self.assertIs(again, plan)
+        self.assertEqual(filters._compile_params_plan.cache_info().hits, 1)
+        self.assertEqual(plan.filter_kwargs, {"amount__gte": "5"})
+
+        other = get_filter_plan(Transaction, QueryDict("amount__gte=6"))
+        self.assertIsNot(other, plan)
+        self.assertEqual(other.filter_kwargs, {"amount__gte": "6"})
+
+    def test_encoded_params_share_a_plan(self):
+        def encode(params):
+            return LZString().compressToEncodedURIComponent(json.dumps(params))
+
+        encoded = encode({"description__search": "lunch", "amount__not_in": "1,2"})
+        plan = get_filter_plan(Transaction, QueryDict(f"q={encoded}"))
+        self.assertIs(get_filter_plan(Transaction, QueryDict(f"q={encoded}")), plan)
+        self.assertEqual(filters._compile_encoded_plan.cache_info().hits, 1)
+        self.assertEqual(plan.exclude_kwargs, {"amount__in": ["1", "2"]})
+        self.assertEqual(plan.params["description__search"], "lunch")
+
+        other = get_filter_plan(
+            Transaction, QueryDict(f"q={encode({'description__search': 'dinner'})}")
+        )
+        self.assertIsNot(other, plan)
+        self.assertEqual(other.exclude_kwargs, {})
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", password="admin")
+        first = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        second = datetime(2024, 2, 1, tzinfo=dt_timezone.utc)
+        for due in (first, None, second, first, None, first, second):
+            Receivable.objects.create(lent_amount=Decimal("1"), datetime_due=due)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, order_by):
+        url = f"/finance/receivables/?cursor=&page_size=2&order_by={order_by}"
+        pages = []
+        while url:
+            data = self.client.get(url).json()
+            pages.append(data["ids"])
+            url = data["next"]
+        forward = [pk for page in pages for pk in page]
+
+        backward = []
+        url = data["previous"]
+        while url:
+            data = self.client.get(url).json()
+            backward = data["ids"] + backward
+            url = data["previous"]
+        self.assertEqual(backward + pages[-1], forward)
+        return forward
+
+    def expected(self, descending):
+        rows = list(Receivable.objects.values_list("datetime_due", "id"))
+        dated = sorted((row for row in rows if row[0]), reverse=descending)
+        undated = sorted((row for row in rows if not row[0]), reverse=descending)
+        return [pk for _, pk in dated + undated]
+
+    def test_walks_ties_and_nulls_both_ways(self):
+        self.assertEqual(self.walk("datetime_due"), self.expected(False))
+        self.assertEqual(self.walk("-datetime_due"), self.expected(True))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get("/finance/receivables/?cursor=garbage")
+        self.assertEqual(response.status_code, 400)
+
+
+class ApproximateCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for amount in range(3):
+            Transaction.objects.create(description="Row", amount=Decimal(amount))
+
+    def count(self, queryset, *rows):
+        """
+        Counts `queryset` as if on PostgreSQL, with the pg_class and EXPLAIN
+        lookups answering `rows` in order.
+        """
+        fake = mock.MagicMock(vendor="postgresql")
+        cursor = fake.cursor.return_value.__enter__.return_value
+        cursor.fetchone.side_effect = rows
+        with mock.patch.object(paginations, "connections", {queryset.db: fake}):
+            paginator = ApproximateCountPaginator(queryset.order_by("id"), 2)
+            return paginator.count, paginator.approximate, cursor
+
+    @override_settings(APPROXIMATE_COUNT_THRESHOLD=100)
+    def test_small_tables_are_counted_exactly(self):
+        count, approximate, _ = self.count(Transaction.objects.all(), (50.0,))
+        self.assertEqual((count, approximate), (3, False))
+
+    @override_settings(APPROXIMATE_COUNT_THRESHOLD=100)
+    def test_narrow_filters_are_counted_exactly(self):
+        queryset = Transaction.objects.filter(amount__gte=1)
+        plan = [{"Plan": {"Plan Rows": 20}}]
+        count, approximate, _ = self.count(queryset, (500.0,), (plan,))
+        self.assertEqual((count, approximate), (2, False))
+
+    @override_settings(APPROXIMATE_COUNT_THRESHOLD=0)
+    def test_disabled_threshold_never_estimates(self):
+        count, approximate, cursor = self.count(Transaction.objects.all(), (500.0,))
+        self.assertEqual((count, approximate), (3, False))
+        cursor.execute.assert_not_called()
+
+    @override_settings(APPROXIMATE_COUNT_THRESHOLD=100)
+    def test_large_tables_are_estimated(self):
+        count, approximate, _ = self.count(Transaction.objects.all(), (500.0,))
+        self.assertEqual((count, approximate), (500, True))
+
+        queryset = Transaction.objects.filter(amount__gte=1)
+        plan = json.dumps([{"Plan": {"Plan Rows": 200}}])
+        count, approximate, _ = self.count(queryset, (500.0,), (plan,))
+        self.assertEqual((count, approximate), (200, True))
+
+    @override_settings(APPROXIMATE_COUNT_THRESHOLD=100)
+    def test_other_databases_are_counted_exactly(self):
+        queryset = Transaction.objects.all()
+        with mock.patch.object(connection, "vendor", "sqlite"):
+            paginator = ApproximateCountPaginator(queryset.order_by("id"), 2)
+            self.assertEqual(paginator.count, 3)
+        self.assertFalse(paginator.approximate)
+
+
+class SearchTests(TestCase):
+    def test_other_databases_fall_back_to_icontains(self):
+        Transaction.objects.create(description="Team lunch", amount=Decimal("1"))
+        Transaction.objects.create(description="Dinner", amount=Decimal("1"))
+        with mock.patch.object(search, "connection", mock.Mock(vendor="sqlite")):
+            q, rank = search.build_search_q(Transaction, "description", "LUN team")
+        self.assertIsNone(rank)
+        expected = Q(description__icontains="LUN") & Q(description__icontains="team")
+        self.assertEqual(q, expected)
+        names = Transaction.objects.filter(q).values_list("description", flat=True)
+        self.assertEqual(list(names), ["Team lunch"])
+
+    def test_trigram_index_is_a_no_op_off_postgresql(self):
+        operation = search.AddTrigramIndex("transaction", "description")
+        schema_editor = mock.Mock()
+        schema_editor.connection.vendor = "sqlite"
+        operation.database_forwards("finance", schema_editor, None, None)
+        operation.database_backwards("finance", schema_editor, None, None)
+        schema_editor.execute.assert_not_called()
+
+
+class FastPathTests(TestCase):
+    """
+    The values() fast path has to render byte-for-byte what the DRF
+    serializers render.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", password="admin")
+        account = Account.objects.create(name="Bank")
+        category = Category.objects.create(title="Food", nature=0)
+        cls.transactions = [
+            Transaction.objects.create(
+                description="Lunch",
+                amount=Decimal("123.45"),
+                category=category,
+                transmitter=account,
+            ),
+            Transaction.objects.create(description="", amount=Decimal("0")),
+            Transaction.objects.create(description="Refund", amount=Decimal("-7.5")),
+        ]
+        receivable = Receivable.objects.create(
+            lent_amount=Decimal("50"), charge_transaction=cls.transactions[0]
+        )
+        receivable.payment.set(cls.transactions[1:])
+        Receivable.objects.create(lent_amount=Decimal("10.10"))
+
+        tags = [Tag.objects.create(name=name) for name in ("b", "a", "c")]
+        event = Event.objects.create(title="Standup", date_start=timezone.now())
+        # Added out of pk order; DRF lists them by the target pk
+        event.tags.add(tags[2])
+        event.tags.add(tags[0])
+        Event.objects.create(title="Review", excuse="Sick")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def render_both(self, serializer_class):
+        queryset = serializer_class.Meta.model.objects.order_by("-id")
+        fast_fields = get_fast_fields(serializer_class)
+        renderer = CamelCaseJSONRenderer()
+        expected = renderer.render(serializer_class(queryset, many=True).data)
+        actual = renderer.render(
+            serialize_rows(
+                queryset.model,
+                fast_fields,
+                get_values_queryset(queryset, fast_fields),
+            )
+        )
+        return actual, expected
+
+    def test_serializers_render_identically(self):
+        checked = 0
+        for serializer_class in get_serializer_classes():
+            if get_fast_fields(serializer_class) is None:
+                continue
+            with self.subTest(serializer=serializer_class.__name__):
+                actual, expected = self.render_both(serializer_class)
+                self.assertEqual(actual, expected)
+                checked += 1
+        self.assertGreater(checked, 0)
+
+    def test_method_fields_fall_back(self):
+        self.assertIsNone(get_fast_fields(ScheduleSerializer))
+
+    def test_list_responses_match_drf_path(self):
+        urls = [
+            (TransactionViewSet, "/finance/transactions/?page=1"),
+            (TransactionViewSet, "/finance/transactions/?page=1&fields=amount"),
+            (TransactionViewSet, "/finance/transactions/?page=1&order_by=amount"),
+            (TransactionViewSet, "/finance/transactions/?cursor=&page_size=2"),
+            (ReceivableViewSet, "/finance/receivables/?page=1"),
+            (EventViewSet, "/productivity/events/?page=1"),
+        ]
+        for viewset, url in urls:
+            with self.subTest(url=url):
+                fast = self.client.get(url)
+                cache.clear()
+                with mock.patch.object(viewset, "fast_list", False):
+                    slow = self.client.get(url)
+                cache.clear()
+                self.assertEqual(fast.status_code, 200)
+                self.assertEqual(fast.content, slow.content)
+
+    def test_streamed_list_matches_drf_path(self):
+        url = "/finance/transactions/?page=all"
+        fast = b"".join(self.client.get(url).streaming_content)
+        cache.clear()
+        with mock.patch.object(TransactionViewSet, "fast_list", False):
+            slow = b"".join(self.client.get(url).streaming_content)
+        self.assertEqual(fast, slow)
+
+
+class CamelCaseCodecTests(TestCase):
+    """
+    The memoized renderer and parser have to agree with
+    djangorestframework_camel_case, with and without orjson.
+    """
+
+    payload = {
+        "count": 2,
+        "next_page": None,
+        "results": [
+            {
+                "id": 1,
+                "date_start": date(2024, 1, 2),
+                "updated_at": datetime(2024, 1, 2, 3, 4, 5, 678901, dt_timezone.utc),
+                "amount": Decimal("123.45"),
+                "is_archived": False,
+                "title": "Caf\u00e9 \u2028 line",
+                "tags": (1, 2),
+                "nested_list": [{"inner_key_2": 1.5}],
+                "field_1_a": "x",
+            }
+        ],
+    }
+
+    def render_with(self, module_orjson):
+        with mock.patch.object(renderers, "orjson", module_orjson):
+            return CamelCaseJSONRenderer().render(self.payload)
+
+    def test_renderer_matches_library(self):
+        expected = camel_render.CamelCaseJSONRenderer().render(self.payload)
+        self.assertEqual(self.render_with(None), expected)
+        if renderers.orjson is not None:
+            self.assertEqual(self.render_with(renderers.orjson), expected)
+
+    def test_parser_matches_library(self):
+        body = b'{"dateStart": "2024-01-02", "nestedList": [{"innerKey2": 1}],'
+        body += b' "HTMLBody": "x", "field1A": null, "ids": [1, 2]}'
+        expected = camel_parser.CamelCaseJSONParser().parse(BytesIO(body))
+        for module_orjson in (None, parsers.orjson):
+            with mock.patch.object(parsers, "orjson", module_orjson):
+                self.assertEqual(CamelCaseJSONParser().parse(BytesIO(body)), expected)
+
+    def test_msgpack_round_trip(self):
+        packed = CamelCaseMessagePackRenderer().render(self.payload)
+        as_json = json.loads(CamelCaseJSONRenderer().render(self.payload))
+        unpacked = msgpack.unpackb(packed, timestamp=3)
+        result = unpacked["results"][0]
+        updated_at = self.payload["results"][0]["updated_at"]
+        self.assertEqual(result.pop("updatedAt"), updated_at)
+        as_json["results"][0].pop("updatedAt")
+        self.assertEqual(unpacked, as_json)
+
+        parsed = CamelCaseMessagePackParser().parse(BytesIO(packed))
+        self.assertEqual(parsed["results"][0]["nested_list"], [{"inner_key_2": 1.5}])
+
+    def test_msgpack_negotiation(self):
+        User.objects.create_superuser("admin", password="admin")
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username="admin"))
+        Transaction.objects.create(description="Lunch", amount=Decimal("1.5"))
+        url = "/finance/transactions/?page=1"
+        as_json = client.get(url).json()
+        response = client.get(url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), as_json)
+
+
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", password="admin")
+        Transaction.objects.bulk_create(
+            Transaction(description=f"Lunch {i}", amount=Decimal(i)) for i in range(50)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_gzip_round_trip(self):
+        url = "/finance/transactions/?page=1"
+        plain = self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response["ETag"], f"W/{plain['ETag']}")
+
+        revalidated = self.client.get(
+            url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_streamed_gzip_round_trip(self):
+        url = "/finance/transactions/?page=all"
+        plain = b"".join(self.client.get(url).streaming_content)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        body = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(body, plain)
+
+    @override_settings(COMPRESSION_MIN_SIZES={"application/json": 0})
+    def test_compressed_schema_revalidates(self):
+        url = "/schema/finance.transaction"
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertTrue(response["ETag"].startswith("W/"))
+        revalidated = self.client.get(
+            url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_small_bodies_are_not_compressed(self):
+        response = self.client.get(
+            "/finance/transactions/?page=1&page_size=1", HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser("admin", password="admin")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_related_deletes_and_m2m_changes_change_the_etag(self):
+        tags = [Tag.objects.create(name=name) for name in ("a", "b")]
+        event = Event.objects.create(title="Standup")
+        event.tags.set(tags)
+        url = "/productivity/events/?page=1"
+        etag = self.client.get(url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tags[0].delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["tags"], [tags[1].pk])
+
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            event.tags.set([])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["tags"], [])
+
+
+class SparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", password="admin")
+        account = Account.objects.create(name="Bank")
+        cls.transaction = Transaction.objects.create(
+            description="Lunch", amount=Decimal("12.5"), transmitter=account
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_fields_keeps_only_the_requested_keys(self):
+        url = "/finance/transactions/?page=1&fields=description,datetimeTransacted"
+        results = self.client.get(url).json()["results"]
+        self.assertEqual(set(results[0]), {"id", "description", "datetimeTransacted"})
+
+        url = f"/finance/transactions/{self.transaction.pk}/?fields=amount"
+        self.assertEqual(set(self.client.get(url).json()), {"id", "amount"})
+
+    def test_omit_drops_the_named_keys(self):
+        url = "/finance/transactions/?page=1&omit=description,transmitter"
+        item = self.client.get(url).json()["results"][0]
+        self.assertNotIn("description", item)
+        self.assertNotIn("transmitter", item)
+        self.assertIn("amount", item)
+
+    def test_only_the_requested_columns_are_loaded(self):
+        url = f"/finance/transactions/{self.transaction.pk}/?fields=description"
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        rows = [
+            query["sql"]
+            for query in queries
+            if '"finance_transaction"."description"' in query["sql"]
+        ]
+        self.assertEqual(len(rows), 1)
+        self.assertNotIn('"finance_transaction"."amount"', rows[0])
+        self.assertNotIn('"finance_transaction"."transmitter_id"', rows[0])
+
+    def test_unknown_fields_are_rejected(self):
+        for param in ("fields=description,bogus", "omit=bogus"):
+            response = self.client.get(f"/finance/transactions/?page=1&{param}")
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("bogus", str(response.json()))
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser("admin", password="admin")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=None):
+        params = {"since": since} if since else {}
+        response = self.client.get("/finance/accounts/sync/", params)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_rows_committed_after_a_sync_reach_the_next_one(self):
+        started = timezone.now()
+        first = self.sync()
+        self.assertTrue(first["full"])
+        self.assertLess(parse_datetime(first["watermark"]), started)
+
+        # Saved before the first sync ran but only committed after it
+        account = Account.objects.create(name="Late")
+        Account.objects.filter(pk=account.pk).update(
+            updated_at=started - timedelta(seconds=1)
+        )
+        second = self.sync(first["watermark"])
+        self.assertFalse(second["full"])
+        self.assertIn(account.pk, second["ids"])
+
+    @override_settings(TOMBSTONE_RETENTION_DAYS=30)
+    def test_old_tombstones_are_pruned(self):
+        Tombstone.objects.create(model="finance.account", object_id=1)
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+        Tombstone.objects.create(model="finance.account", object_id=2)
+        self.assertEqual(prune_tombstones(), 1)
+        self.assertEqual(Tombstone.objects.count(), 1)
+
+        stale = (timezone.now() - timedelta(days=31)).isoformat()
+        self.assertTrue(self.sync(stale)["full"])
+
+
+class ModelVersionTests(TestCase):
+    def test_one_bump_per_transaction(self):
+        before = get_model_versions(Tag, Account)
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                for name in ("One", "Two", "Three"):
+                    Tag.objects.create(name=name)
+                Account.objects.create(name="Bank")
+        updates = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith("UPDATE") and "core_modelversion" in query["sql"]
+        ]
+        self.assertEqual(len(updates), 1)
+        after = get_model_versions(Tag, Account)
+        self.assertEqual(after, [version + 1 for version in before])
+
+    def test_rolled_back_writes_do_not_swallow_later_bumps(self):
+        before = get_model_versions(Tag)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Tag.objects.create(name="Gone")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            Tag.objects.create(name="Kept")
+        self.assertEqual(get_model_versions(Tag), [before[0] + 1])
+
+
+class BulkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("editor", password="editor")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def grant(self, codename):
+        permission = Permission.objects.get(
+            content_type__app_label="productivity", codename=codename
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.add(permission)
+        # A fresh instance, as the next request would load
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+
+    def test_upserting_existing_rows_needs_change_permission(self):
+        self.grant("add_tag")
+        tag = Tag.objects.create(name="Mine")
+        url = "/productivity/tags/bulk/"
+        hijack = {"create": [{"id": tag.pk, "name": "Hijacked"}]}
+        self.assertEqual(self.client.post(url, hijack, format="json").status_code, 403)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, "Mine")
+
+        new = {"create": [{"id": tag.pk + 1, "name": "New"}]}
+        self.assertEqual(self.client.post(url, new, format="json").status_code, 200)
+
+        self.grant("change_tag")
+        self.assertEqual(self.client.post(url, hijack, format="json").status_code, 200)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, "Hijacked")
+
+    def count_queries(self, body):
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                url = "/productivity/tags/bulk/"
+                response = self.client.post(url, body, format="json")
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_bulk_writes_cost_the_same_queries_for_any_size(self):
+        self.user.is_superuser = True
+        self.user.save()
+        self.count_queries({"create": [{"name": "Warm"}]})
+        self.count_queries({"delete": list(Tag.objects.values_list("pk", flat=True))})
+
+        creates = [
+            self.count_queries({"create": [{"name": f"Tag {i}"} for i in range(n)]})
+            for n in (5, 50)
+        ]
+        self.assertEqual(creates[0], creates[1])
+
+        pks = list(Tag.objects.order_by("pk").values_list("pk", flat=True))
+        deletes = [
+            self.count_queries({"delete": pks[:5]}),
+            self.count_queries({"delete": pks[5:]}),
+        ]
+        self.assertEqual(deletes[0], deletes[1])
+        self.assertFalse(Tag.objects.exists())
+        tombstones = Tombstone.objects.filter(model="productivity.tag")
+        self.assertEqual(tombstones.count(), 56)
+
+    def test_read_only_rows_cannot_be_upserted(self):
+        self.user.is_superuser = True
+        self.user.save()
+        body = {"create": [{"id": 1000001, "name": "Hijacked"}]}
+        response = self.client.post("/finance/accounts/bulk/", body, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Account.objects.get(pk=1000001).name, "Wallet")
+
+
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", password="admin")
+        Transaction.objects.create(description="Lunch", amount=Decimal("1.5"))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_results_match_single_requests(self):
+        items = [
+            {"route": "finance/transactions", "params": {"page": 1, "pageSize": 5}},
+            {"route": "finance/categories/", "params": {"page": "all"}},
+            {"route": "missing/route"},
+        ]
+        response = self.client.post("/batch", items, format="json")
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], [200, 200, 404])
+
+        cache.clear()
+        single = self.client.get("/finance/transactions/?page=1&page_size=5")
+        self.assertEqual(results[0]["data"], single.json())
+        categories = self.client.get("/finance/categories/?page=all")
+        self.assertEqual(
+            results[1]["data"], json.loads(b"".join(categories.streaming_content))
+        )
+
+
+    def test_failing_items_do_not_fail_the_batch(self):
+        items = [
+            {"route": "finance/transactions", "params": {"id": "abc"}},
+            {"route": "finance/transactions", "params": {"amount__gte": "x"}},
+            {"route": "finance/receivables", "params": {"page": 1}},
+            {"route": "finance/transactions", "params": {"page": 1}},
+        ]
+        broken = mock.patch.object(
+            ReceivableViewSet, "list", side_effect=RuntimeError("boom")
+        )
+        with broken, mock.patch("builtins.print"):
+            response = self.client.post("/batch", items, format="json")
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        statuses = [result["status"] for result in results]
+        self.assertEqual(statuses, [400, 400, 500, 200])
+        self.assertEqual(results[3]["data"]["count"], 1)
+
+
+class BootstrapTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", password="admin")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_snapshot_is_versioned_by_its_tables(self):
+        response = self.client.get("/bootstrap")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        accounts = json.loads(
+            b"".join(self.client.get("/finance/accounts/?page=all").streaming_content)
+        )
+        self.assertEqual(response.json()["accounts"], accounts["results"])
+
+        revalidated = self.client.get("/bootstrap", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(revalidated.status_code, 304)
+        # Versions live in the database, not in this worker's cache
+        cache.clear()
+        self.assertEqual(self.client.get("/bootstrap")["ETag"], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(description="Lunch", amount=Decimal("1"))
+        self.assertEqual(self.client.get("/bootstrap")["ETag"], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Account.objects.create(name="Bank")
+        response = self.client.get("/bootstrap")
+        self.assertNotEqual(response["ETag"], etag)
+        names = [account["name"] for account in response.json()["accounts"]]
+        self.assertIn("Bank", names)
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        local_versions.clear()
+        self.user = User.objects.create_superuser("admin", password="admin")
+        _, token = AuthToken.objects.create(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+
+    def test_cached_token_skips_lookup_until_logout(self):
+        url = "/schema/finance.account"
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.assertEqual(self.client.post("/cookie-logout").status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        url = "/schema/finance.account"
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+    @override_settings(MODEL_VERSION_LOCAL_TIMEOUT=0)
+    def test_logout_in_another_worker_retires_the_entry(self):
+        url = "/schema/finance.account"
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Another worker can only bump the shared version, not evict ours
+        with mock.patch.object(token_cache, "delete_many"):
+            with self.captureOnCommitCallbacks(execute=True):
+                AuthToken.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+@override_settings(TOKEN_SWEEP_INTERVAL=0, AUTH_TOKEN_LIMIT_PER_USER=2)
+class TokenTableTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("viewer", password="viewer")
+
+    def login(self):
+        return APIClient().post(
+            "/cookie-login", {"username": "viewer", "password": "viewer"}
+        )
+
+    def test_login_creates_one_token_within_limit(self):
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(AuthToken.objects.filter(user=self.user).count(), 1)
+        for _ in range(3):
+            response = self.login()
+        self.assertEqual(AuthToken.objects.filter(user=self.user).count(), 2)
+
+        client = APIClient()
+        client.cookies["knox_token"] = response.cookies["knox_token"].value
+        self.assertEqual(client.get("/schema/finance.account").status_code, 200)
+
+    def test_sweep_deletes_expired_tokens(self):
+        for _ in range(5):
+            AuthToken.objects.create(self.user, expiry=timedelta(seconds=-1))
+        AuthToken.objects.create(self.user)
+        self.assertEqual(sweep_expired_tokens(chunk_size=2), 5)
+        self.assertEqual(AuthToken.objects.count(), 1)
+
+
+class PermissionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_versions.clear()
+        self.user = User.objects.create_user("viewer", password="viewer")
+        self.group = Group.objects.create(name="Viewers")
+        self.user.groups.add(self.group)
+        _, token = AuthToken.objects.create(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+
+    def test_group_permission_changes_apply_immediately(self):
+        url = "/finance/accounts/?page=1"
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        permission = Permission.objects.get(codename="view_account")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.add(permission)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        # Only the shared version counters are read
+        for query in queries.captured_queries:
+            self.assertIn("core_modelversion", query["sql"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.remove(permission)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+    def test_warm_checks_run_no_queries(self):
+        perms = ["finance.view_account"]
+        permission = Permission.objects.get(codename="view_account")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.add(permission)
+        self.assertTrue(user_has_perms(User.objects.get(pk=self.user.pk), perms))
+
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(user_has_perms(user, perms))
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def test_reads_use_the_request_replica(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Account), "default")
+        token = replica_alias.set("replica_0")
+        try:
+            self.assertEqual(router.db_for_read(Account), "replica_0")
+            self.assertEqual(router.db_for_write(Account), "default")
+            instance = Account(name="Bank")
+            instance._state.db = "default"
+            self.assertEqual(router.db_for_read(Account, instance=instance), "default")
+        finally:
+            replica_alias.reset(token)
+
+
+    def test_replicas_need_a_shared_write_cache(self):
+        check_write_cache()
+        with override_settings(DATABASE_REPLICAS=["replica_0"]):
+            with self.assertRaises(ImproperlyConfigured):
+                check_write_cache()
+            backend = "django.core.cache.backends.db.DatabaseCache"
+            shared = {"default": {"BACKEND": backend, "LOCATION": "cache"}}
+            with override_settings(CACHES=shared):
+                check_write_cache()
+
+
+class ReadYourWritesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser("admin", password="admin")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(DATABASE_REPLICAS=["default"])
+    def test_writes_pin_reads_to_primary(self):
+        self.client.get("/finance/accounts/?page=1")
+        self.assertFalse(has_recent_write(self.user))
+        self.client.post("/finance/accounts/", {"name": "Bank"}, format="json")
+        self.assertTrue(has_recent_write(self.user))
+
+    @override_settings(DATABASE_REPLICAS=["default"])
+    def test_only_primary_reads_are_cached(self):
+        url = "/finance/accounts/?page=1"
+        with mock.patch.object(
+            CachedResponseMixin, "store_cached_response", return_value=None
+        ) as store:
+            self.client.get(url)
+            store.assert_not_called()
+            self.client.post("/finance/accounts/", {"name": "Bank"}, format="json")
+            self.client.get(url)
+            store.assert_called_once()
+
+    @override_settings(DATABASE_REPLICAS=["default"])
+    def test_event_list_generates_on_the_primary(self):
+        aliases = []
+
+        def generate(counts):
+            def generate_missing_events(params):
+                aliases.append(replica_alias.get())
+                return counts
+
+            return generate_missing_events
+
+        with mock.patch(
+            "productivity.viewsets.generate_missing_events", generate((0, 0))
+        ):
+            self.client.get("/productivity/events/?page=1")
+        self.assertFalse(has_recent_write(self.user))
+
+        with mock.patch(
+            "productivity.viewsets.generate_missing_events", generate((2, 0))
+        ):
+            self.client.get("/productivity/events/?page=1")
+        self.assertEqual(aliases, [None, None])
+        self.assertTrue(has_recent_write(self.user))
+
+
+class AsyncPathTests(TestCase):
+    def test_async_routes_keep_the_sync_view(self):
+        with override_settings(ASYNC_VIEWS=True):
+            view = TransactionViewSet.as_view({"get": "list", "post": "create"})
+        self.assertTrue(iscoroutinefunction(view))
+        self.assertIs(view.cls, TransactionViewSet)
+        self.assertFalse(iscoroutinefunction(view.sync_view))
+        sync_view = TransactionViewSet.as_view({"get": "list"})
+        self.assertFalse(iscoroutinefunction(sync_view))
+
+    def test_async_stream_matches_sync_stream(self):
+        for index in range(5):
+            Transaction.objects.create(description=f"Lunch {index}", amount=index)
+        queryset = Transaction.objects.order_by("-id").values("id", "description")
+        renderer = CamelCaseJSONRenderer()
+        response = stream_list_response(renderer, queryset, list, 2)
+        self.assertFalse(response.is_async)
+        expected = b"".join(response.streaming_content)
+
+        # Only views running under an async route get an async body
+        token = in_async_view.set(True)
+        try:
+            response = stream_list_response(renderer, queryset, list, 2)
+        finally:
+            in_async_view.reset(token)
+        self.assertTrue(response.is_async)
+        self.assertEqual(get_response_body(response), expected)
+        self.assertEqual(json.loads(expected)["count"], 5)
+
+    @override_settings(ASYNC_VIEWS=True)
+    def test_batch_streams_page_all_items(self):
+        user = User.objects.create_superuser("admin", password="admin")
+        Transaction.objects.create(description="Lunch", amount=Decimal("1.5"))
+        client = APIClient()
+        client.force_authenticate(user)
+        items = [{"route": "finance/transactions", "params": {"page": "all"}}]
+        response = client.post("/batch", items, format="json")
+        self.assertEqual(response.status_code, 200)
+        (result,) = response.json()["results"]
+        self.assertEqual(result["status"], 200)
+        self.assertEqual(result["data"]["count"], 1)
@@ -0,0 +1,204 @@
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection
+from django.db.models import Count, Q, Subquery
+from django.utils import timezone
+from hmac import compare_digest
+from knox.models import AuthToken
+from knox.settings import CONSTANTS
+from .versions import get_local_model_version
+import copy
+import hashlib
+import threading
+import time
+
+
+def get_token_cache_key(token_key):
+    """
+    Cache key for a token, hashed from its public key prefix so tokens can
+    also be invalidated from the database row, which never stores the token.
+    """
+    token_key = token_key[: CONSTANTS.TOKEN_KEY_LENGTH]
+    digest = hashlib.sha256(token_key.encode("utf-8")).hexdigest()
+    return f"auth-token:{digest}"
+
+
+def hash_presented_token(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def copy_entry(entry):
+    # Copies keep per-request state (like permission caches) off the entry
+    token_hash, user, auth_token = entry
+    user = copy.copy(user)
+    auth_token = copy.copy(auth_token)
+    auth_token.user = user
+    return token_hash, user, auth_token
+
+
+class TokenCache:
+    """
+    Short-lived map of token -> (token hash, user, AuthToken). Kept in
+    process unless AUTH_TOKEN_CACHE_ALIAS names a shared cache, in which
+    case invalidation reaches every worker. In process, entries remember the
+    AuthToken version they were cached under, so a logout or deactivation
+    in another worker retires them once the local version is re-read.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def get_shared_cache(self):
+        alias = settings.AUTH_TOKEN_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        shared = self.get_shared_cache()
+        if shared is not None:
+            return shared.get(key)
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+        deadline, version, entry = item
+        current = get_local_model_version(AuthToken)
+        if deadline < time.monotonic() or version != current:
+            with self.lock:
+                self.entries.pop(key, None)
+            return None
+        return copy_entry(entry)
+
+    def set(self, key, entry, timeout):
+        shared = self.get_shared_cache()
+        if shared is not None:
+            shared.set(key, entry, timeout)
+            return
+        version = get_local_model_version(AuthToken)
+        with self.lock:
+            if len(self.entries) >= settings.AUTH_TOKEN_CACHE_SIZE:
+                self.prune()
+            deadline = time.monotonic() + timeout
+            self.entries[key] = (deadline, version, copy_entry(entry))
+
+    def delete_many(self, keys):
+        shared = self.get_shared_cache()
+        if shared is not None:
+            shared.delete_many(keys)
+            return
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def prune(self):
+        now = time.monotonic()
+        expired = [key for key, (deadline, *_) in self.entries.items() if deadline < now]
+        for key in expired:
+            del self.entries[key]
+        if len(self.entries) >= settings.AUTH_TOKEN_CACHE_SIZE:
+            self.entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def get_cached_credentials(token):
+    """
+    Returns (user, AuthToken) for a token authenticated within the last
+    AUTH_TOKEN_CACHE_TIMEOUT seconds, or None.
+    """
+    key = get_token_cache_key(token)
+    entry = token_cache.get(key)
+    if entry is None:
+        return None
+    token_hash, user, auth_token = entry
+    if not compare_digest(token_hash, hash_presented_token(token)):
+        return None
+    if auth_token.expiry is not None and auth_token.expiry < timezone.now():
+        # Let knox delete it and send token_expired
+        token_cache.delete_many([key])
+        return None
+    return user, auth_token
+
+
+def cache_credentials(token, user, auth_token):
+    timeout = settings.AUTH_TOKEN_CACHE_TIMEOUT
+    if timeout <= 0:
+        return
+    if auth_token.expiry is not None:
+        remaining = (auth_token.expiry - timezone.now()).total_seconds()
+        timeout = min(timeout, int(remaining))
+        if timeout <= 0:
+            return
+    token_cache.set(
+        get_token_cache_key(token),
+        (hash_presented_token(token), user, auth_token),
+        timeout,
+    )
+
+
+def invalidate_tokens(auth_tokens):
+    token_cache.delete_many(
+        [get_token_cache_key(auth_token.token_key) for auth_token in auth_tokens]
+    )
+
+
+def sweep_expired_tokens(chunk_size=None):
+    """
+    Deletes expired tokens in chunks so no single statement holds locks on
+    the whole table. Returns the number of tokens removed.
+    """
+    chunk_size = chunk_size or settings.TOKEN_SWEEP_CHUNK_SIZE
+    deleted = 0
+    while True:
+        pks = list(
+            AuthToken.objects.filter(expiry__lt=timezone.now()).values_list(
+                "pk", flat=True
+            )[:chunk_size]
+        )
+        if not pks:
+            return deleted
+        deleted += AuthToken.objects.filter(pk__in=pks).delete()[0]
+
+
+def run_background_sweep():
+    try:
+        deleted = sweep_expired_tokens()
+        if deleted:
+            print(f"Swept {deleted} expired tokens")
+    except Exception as e:
+        print("Token sweep failed:", e)
+    finally:
+        connection.close()
+
+
+def maybe_sweep_expired_tokens():
+    """
+    Starts a background sweep at most once per TOKEN_SWEEP_INTERVAL across
+    workers sharing the default cache.
+    """
+    interval = settings.TOKEN_SWEEP_INTERVAL
+    if interval <= 0 or not cache.add("token-sweep", True, interval):
+        return
+    threading.Thread(target=run_background_sweep, daemon=True).start()
+
+
+def enforce_token_limit(user):
+    """
+    Deletes all but the user's newest AUTH_TOKEN_LIMIT_PER_USER tokens.
+    """
+    limit = settings.AUTH_TOKEN_LIMIT_PER_USER
+    if limit <= 0:
+        return
+    newest = (
+        AuthToken.objects.filter(user=user).order_by("-created").values("pk")[:limit]
+    )
+    AuthToken.objects.filter(user=user).exclude(pk__in=Subquery(newest)).delete()
+
+
+def get_token_table_stats():
+    return AuthToken.objects.aggregate(
+        total=Count("pk"),
+        expired=Count("pk", filter=Q(expiry__lt=timezone.now())),
+        users=Count("user", distinct=True),
+    )
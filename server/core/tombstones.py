@@ -0,0 +1,63 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import Tombstone
+
+pending_tombstones = ContextVar("pending_tombstones", default=None)
+
+
+def get_tombstone_cutoff():
+    """
+    Oldest sync watermark still answered with a delta. Tombstones before it
+    are pruned, so older clients get a full resync instead.
+    """
+    return timezone.now() - timedelta(days=settings.TOMBSTONE_RETENTION_DAYS)
+
+
+@contextmanager
+def collect_tombstones():
+    """
+    Buffers the tombstones recorded inside the block and writes them with
+    one bulk_create once it exits cleanly.
+    """
+    tombstones = []
+    token = pending_tombstones.set(tombstones)
+    try:
+        yield
+    finally:
+        pending_tombstones.reset(token)
+    if tombstones:
+        Tombstone.objects.bulk_create(tombstones)
+
+
+def prune_tombstones(chunk_size=None):
+    """
+    Deletes tombstones older than the retention window in chunks. Returns
+    the number of tombstones removed.
+    """
+    chunk_size = chunk_size or settings.TOMBSTONE_PRUNE_CHUNK_SIZE
+    cutoff = get_tombstone_cutoff()
+    deleted = 0
+    while True:
+        pks = list(
+            Tombstone.objects.filter(deleted_at__lt=cutoff).values_list(
+                "pk", flat=True
+            )[:chunk_size]
+        )
+        if not pks:
+            return deleted
+        deleted += Tombstone.objects.filter(pk__in=pks).delete()[0]
+
+
+def maybe_prune_tombstones():
+    """
+    Prunes at most once per TOMBSTONE_PRUNE_INTERVAL across workers sharing
+    the default cache.
+    """
+    interval = settings.TOMBSTONE_PRUNE_INTERVAL
+    if interval <= 0 or not cache.add("tombstone-prune", True, interval):
+        return
+    prune_tombstones()
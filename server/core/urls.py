@@ -32,4 +32,8 @@ urlpatterns = [
     path("cookie-login", views.CookieLoginView.as_view(), name="cookie-login"),
     path("cookie-reauth", views.CookieReauthView.as_view(), name="cookie-reauth"),
     path("csrf/", views.csrf),
+    path("batch", views.BatchView.as_view(), name="batch"),
+    path("bootstrap", views.BootstrapView.as_view(), name="bootstrap"),
+    path("internal/stats", views.StatsView.as_view(), name="stats"),
+    path("schema/<str:model>", views.SchemaView.as_view(), name="schema"),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
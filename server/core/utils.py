@@ -178,5 +178,10 @@ def Period(*fields, separator="-"):
     return Concat(*parts, output_field=CharField())
 
 
+def to_camel_case(s):
+    parts = s.split("_")
+    return parts[0] + "".join(p.capitalize() for p in parts[1:])
+
+
 def camel_to_kebab(name: str) -> str:
     return re.sub(r"(?<!^)(?=[A-Z])", "-", name).lower()
@@ -0,0 +1,109 @@
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from functools import lru_cache, partial
+from .models import CustomModel, ModelVersion
+import time
+
+
+@lru_cache(maxsize=None)
+def get_dependent_models(model):
+    """
+    `model` plus every CustomModel whose responses embed it through a
+    foreign key or many-to-many, followed transitively.
+    """
+    dependents = [model]
+    for dependent in dependents:
+        for other in apps.get_models():
+            if other in dependents or not issubclass(other, CustomModel):
+                continue
+            for field in other._meta.get_fields():
+                if (
+                    (field.many_to_one or field.many_to_many)
+                    and not field.auto_created
+                    and field.related_model is dependent
+                ):
+                    dependents.append(other)
+                    break
+    return tuple(dependents)
+
+
+def get_model_versions(*models):
+    labels = [model._meta.label_lower for model in models]
+    versions = ModelVersion.objects.using(DEFAULT_DB_ALIAS).filter(model__in=labels)
+    versions = dict(versions.values_list("model", "version"))
+    missing = [label for label in labels if label not in versions]
+    if missing:
+        seed_model_versions(missing)
+        seeded = ModelVersion.objects.using(DEFAULT_DB_ALIAS).filter(model__in=missing)
+        versions.update(seeded.values_list("model", "version"))
+    return [versions[label] for label in labels]
+
+
+# label -> (deadline, version) as last read by this process
+local_versions = {}
+
+
+def get_local_model_version(model):
+    """
+    `model`'s version as seen by this process, re-read from the database at
+    most every MODEL_VERSION_LOCAL_TIMEOUT seconds. Bumps made here are seen
+    at once; bumps made by other workers within that window.
+    """
+    label = model._meta.label_lower
+    item = local_versions.get(label)
+    now = time.monotonic()
+    if item is None or item[0] < now:
+        (version,) = get_model_versions(model)
+        item = (now + settings.MODEL_VERSION_LOCAL_TIMEOUT, version)
+        local_versions[label] = item
+    return item[1]
+
+
+def seed_model_versions(labels):
+    # Seeded from the clock so a reset table never reuses old keys
+    ModelVersion.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+        [ModelVersion(model=label, version=time.time_ns()) for label in labels],
+        ignore_conflicts=True,
+    )
+
+
+def bump_model_version(*models):
+    labels = list(
+        dict.fromkeys(
+            dependent._meta.label_lower
+            for model in models
+            for dependent in get_dependent_models(model)
+        )
+    )
+    updated = (
+        ModelVersion.objects.using(DEFAULT_DB_ALIAS)
+        .filter(model__in=labels)
+        .update(version=F("version") + 1)
+    )
+    if updated < len(labels):
+        seed_model_versions(labels)
+    for label in labels:
+        local_versions.pop(label, None)
+
+
+def flush_model_versions(pending):
+    if pending:
+        models = list(pending)
+        pending.clear()
+        bump_model_version(*models)
+
+
+def bump_model_version_on_commit(model, using=DEFAULT_DB_ALIAS):
+    """
+    Bumps `model` once the current transaction commits. Models queued on the
+    same connection share one set, and whichever callback runs first bumps
+    them all in one UPDATE, so the rest are no-ops.
+    """
+    connection = connections[using]
+    pending = getattr(connection, "pending_model_versions", None)
+    if pending is None:
+        pending = connection.pending_model_versions = set()
+    pending.add(model)
+    transaction.on_commit(partial(flush_model_versions, pending), using=using)
@@ -6,11 +6,24 @@ from rest_framework import permissions, response, status, generics
 from rest_framework.authtoken.serializers import AuthTokenSerializer
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from django.conf import settings
 import os
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from .viewsets import CustomAuthentication
+from .batch import run_batch
+from .bootstrap import get_bootstrap_tables, get_snapshot, get_view_permission
+from .compression import compression_stats
+from .conditional import etag_matches
+from .dbstats import get_database_stats
+from .permissions import user_has_perms
+from .schema import get_model_schema, get_schema_model
+from .tokens import (
+    enforce_token_limit,
+    get_token_table_stats,
+    maybe_sweep_expired_tokens,
+)
+from django.http import Http404
 from django.views.decorators.csrf import ensure_csrf_cookie
 
 
@@ -29,6 +42,90 @@ class CustomAPIView(APIView):
     ]
 
 
+class SchemaView(CustomAPIView):
+    def get(self, request, model):
+        model_class = get_schema_model(model)
+        if model_class is None:
+            raise Http404(f"Unknown model {model}")
+
+        schema = get_model_schema(model_class)
+        etag = f'"{schema.version}"'
+        if etag_matches(etag, request.headers.get("If-None-Match")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(
+                {"model": model_class._meta.label_lower, "version": schema.version}
+                | schema.fields
+            )
+        response["ETag"] = etag
+        return response
+
+
+class BatchView(CustomAPIView):
+    """
+    Runs a list of `{route, params}` GET sub-requests in one round trip,
+    authenticating once and answering each with its own status code.
+    """
+
+    def post(self, request):
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get("requests")
+        if not isinstance(items, list):
+            return Response(
+                {"detail": "Expected a list of requests"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > settings.BATCH_MAX_REQUESTS:
+            return Response(
+                {"detail": f"At most {settings.BATCH_MAX_REQUESTS} requests"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return HttpResponse(run_batch(request, items), content_type="application/json")
+
+
+class BootstrapView(CustomAPIView):
+    """
+    Versioned snapshot of the small reference tables clients load on start,
+    limited to the tables the user can view.
+    """
+
+    def get(self, request):
+        tables = [
+            (key, viewset)
+            for key, viewset in get_bootstrap_tables()
+            if user_has_perms(
+                request.user, [get_view_permission(viewset.queryset.model)]
+            )
+        ]
+        version, content = get_snapshot(tables)
+        etag = f'"{version}"'
+        if etag_matches(etag, request.headers.get("If-None-Match")):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(content, content_type="application/json")
+        response["ETag"] = etag
+        return response
+
+
+class StatsView(CustomAPIView):
+    """
+    Internal per-process counters: database connections or pool usage,
+    compression savings and the token table size.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(
+            {
+                "databases": get_database_stats(),
+                "compression": compression_stats.snapshot(),
+                "tokens": get_token_table_stats(),
+            }
+        )
+
+
 class RegistrationAPI(generics.GenericAPIView):
     serializer_class = UserSerializer
     api_view = ["POST", "GET"]
@@ -90,9 +187,10 @@ class CookieLoginView(KnoxLoginView):
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data["user"]
         login(request, user)
-        response = super().post(request, format=None)
         if user:
             response = super().post(request, format=None)
+            enforce_token_limit(user)
+            maybe_sweep_expired_tokens()
             token = response.data.get("token")
             cookie_response = JsonResponse(
                 {
@@ -1,14 +1,39 @@
 from rest_framework import viewsets, response
 from .models import *
 from .serializers import *
-from .permissions import CustomDjangoModelPermission
+from .permissions import CustomDjangoModelPermission, user_has_perms
 from knox.auth import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.core.exceptions import FieldDoesNotExist
-from django.db.models import Q
-import json
-from lzstring import LZString
-from django.db.models import CharField
+from rest_framework.permissions import IsAuthenticated, AllowAny, SAFE_METHODS
+from .asyncviews import AsyncViewSetMixin
+from .bulk import (
+    READ_ONLY_PK,
+    BulkUpdateListSerializer,
+    bulk_save,
+    resolve_relations,
+    serial_save,
+    supports_bulk_writes,
+    to_pk,
+)
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin, get_related_models
+from .fastpath import get_fast_serializer, get_values_queryset, serialize_rows
+from .filters import get_filter_plan
+from .relations import get_relation_plan, get_sparse_fields
+from .replicas import ReplicaReadMixin
+from .streaming import stream_list_response
+from .tombstones import (
+    collect_tombstones,
+    get_tombstone_cutoff,
+    maybe_prune_tombstones,
+)
+from .tokens import cache_credentials, get_cached_credentials
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 
 
 class CustomAuthentication(TokenAuthentication):
@@ -28,13 +53,22 @@ class CustomAuthentication(TokenAuthentication):
 
         return None
 
+    def authenticate_credentials(self, token):
+        cached = get_cached_credentials(token.decode("utf-8"))
+        if cached is not None:
+            return cached
+        user, auth_token = super().authenticate_credentials(token)
+        cache_credentials(token.decode("utf-8"), user, auth_token)
+        return user, auth_token
 
-def decode_query_param(encoded_param):
-    lz = LZString()
-    return json.loads(lz.decompressFromEncodedURIComponent(encoded_param))
 
-
-class CustomModelViewSet(viewsets.ModelViewSet):
+class CustomModelViewSet(
+    AsyncViewSetMixin,
+    ReplicaReadMixin,
+    CachedResponseMixin,
+    ConditionalGetMixin,
+    viewsets.ModelViewSet,
+):
     permission_classes = [
         # AllowAny,
         IsAuthenticated,
@@ -42,94 +76,136 @@ class CustomModelViewSet(viewsets.ModelViewSet):
     ]
     authentication_classes = (CustomAuthentication,)
 
+    # Override to replace the relations planned from the serializer
+    select_related_fields = None
+    prefetch_related_fields = None
+    only_fields = None
+    # Set to False to always serialize list pages through DRF
+    fast_list = True
+
+    def get_sparse_fields(self):
+        """
+        Serializer fields kept by the `fields`/`omit` params on reads, or None
+        when the full representation is wanted.
+        """
+        params = self.request.query_params
+        if self.request.method not in SAFE_METHODS or not (
+            params.get("fields") or params.get("omit")
+        ):
+            return None
+        try:
+            return get_sparse_fields(
+                self.get_serializer_class(), params.get("fields"), params.get("omit")
+            )
+        except ValueError as e:
+            raise ValidationError({"fields": str(e)})
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs.setdefault("fields", fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+        plan = get_relation_plan(queryset.model, self.get_serializer_class(), fields)
+
+        select_related = self.select_related_fields
+        if select_related is None:
+            select_related = plan.select_related
+        prefetch_related = self.prefetch_related_fields
+        if prefetch_related is None:
+            prefetch_related = plan.prefetch_related
+        only = self.only_fields
+        if only is None or fields is not None:
+            only = plan.only
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        if only and self.request.method in SAFE_METHODS:
+            queryset = queryset.only(*only)
+        return queryset
+
+    def get_fast_fields(self):
+        """
+        FastFields for building list pages straight from values(), or None
+        when the serializer needs the regular DRF path.
+        """
+        if not self.fast_list:
+            return None
+        return get_fast_serializer(
+            self.get_serializer_class(), self.get_sparse_fields()
+        )
+
+    def serialize_list(self, rows, fast_fields=None):
+        if fast_fields is not None:
+            return serialize_rows(self.queryset.model, fast_fields, rows)
+        return self.get_serializer(rows, many=True).data
+
+    def is_cursor_request(self):
+        cursor_param = getattr(self.paginator, "cursor_query_param", None)
+        return cursor_param in self.request.query_params
+
     def list(self, request, *args, **kwargs):
+        cached = self.get_cached_response(self.queryset.model)
+        if cached:
+            return cached
+
         params = self.request.query_params.copy()
         page_param = params.get("page", None)
         order_by = params.pop("order_by", [])
-        encoded = params.get("q", None)
+        plan = get_filter_plan(self.queryset.model, params)
+        if plan.params is not None:
+            params = plan.params
 
-        decoded_params = {}
-        if encoded:
-            try:
-                decoded_params = decode_query_param(encoded)
-                params = decoded_params
-            except Exception as e:
-                print("Decoding failed:", e)
-
-        filter_kwargs = {}
-        exclude_kwargs = {}
-        search_q = Q()
-        model_fields = [f.name for f in self.queryset.model._meta.get_fields()]
-        for key, value in params.items():
-            base_key = key.split("__")[0]
-            if base_key not in model_fields:
-                continue
-            if "__search" in key:
-                field_name = key.replace("__search", "")
-                search_terms = value.split()
-                try:
-                    field = self.queryset.model._meta.get_field(field_name)
-                    for term in search_terms:
-                        search_q &= Q(**{f"{field_name}__icontains": term})
-                except FieldDoesNotExist:
-                    for term in search_terms:
-                        search_q &= Q(**{f"{field_name}__icontains": term})
-                if field.choices:
-                    matched_values = [
-                        val
-                        for val, label in field.choices
-                        if any(term.lower() in label.lower() for term in search_terms)
-                    ]
-                    search_q &= Q(**{f"{field_name}__in": matched_values})
-                if field.is_relation:
-                    rel_model = field.related_model
-                    char_fields = [
-                        f.name
-                        for f in rel_model._meta.get_fields()
-                        if isinstance(f, CharField)
-                    ]
-                    for term in search_terms:
-                        for rel_char in char_fields:
-                            lookup = f"{field.name}__{rel_char}__icontains"
-                            search_q |= Q(**{lookup: term})
-            elif "__not_" in key:
-                actual_key = key.replace("__not_", "__")
-                if actual_key.endswith("__in"):
-                    exclude_kwargs[actual_key] = value.split(",")
-                else:
-                    exclude_kwargs[actual_key] = value
-            else:
-                if key.endswith("__in"):
-                    filter_kwargs[key] = value.split(",")
-                else:
-                    filter_kwargs[key] = value
-
-        queryset = (
-            self.filter_queryset(self.get_queryset())
-            .filter(**filter_kwargs)
-            .filter(search_q)
-            .exclude(**exclude_kwargs)
-        )
+        queryset = plan.apply(self.filter_queryset(self.get_queryset()))
 
         if order_by:
             try:
                 queryset = queryset.order_by(*order_by)
             except Exception as e:
                 print("Order failed:", e)
+        elif plan.rank is not None and not self.is_cursor_request():
+            queryset = queryset.order_by("-search_rank", "-id")
         else:
             queryset = queryset.order_by("-id")
 
         self.paginator.model = queryset.model
+        self.paginator.fields = self.get_sparse_fields()
 
         check_last_updated = params.get("check_last_updated")
         last_updated = params.get("last_updated")
         if check_last_updated:
-            queryset = queryset.filter(updated_at__gte=last_updated)
-            return response.Response({"count": len(queryset)})
+            changed = queryset.filter(updated_at__gte=last_updated).count()
+            deleted = Tombstone.objects.filter(
+                model=queryset.model._meta.label_lower, deleted_at__gte=last_updated
+            ).count()
+            return response.Response({"count": changed + deleted})
+
+        not_modified = self.check_not_modified(
+            queryset, get_related_models(queryset.model)
+        )
+        if not_modified:
+            return not_modified
+
+        fast_fields = self.get_fast_fields()
+        if fast_fields is not None:
+            queryset = get_values_queryset(queryset, fast_fields)
 
         if page_param == "all":
+            if request.accepted_renderer.format == "json":
+                return stream_list_response(
+                    request.accepted_renderer,
+                    queryset,
+                    lambda rows: self.serialize_list(rows, fast_fields),
+                    settings.STREAM_CHUNK_SIZE,
+                )
+
             all_queryset = list(queryset)
-            serializer = self.get_serializer(all_queryset, many=True)
+            data = self.serialize_list(all_queryset, fast_fields)
 
             return response.Response(
                 {
@@ -138,19 +214,204 @@ class CustomModelViewSet(viewsets.ModelViewSet):
                     "total_pages": 1,
                     "next": None,
                     "previous": None,
-                    "ids": [
-                        item.get("id")
-                        for item in serializer.data
-                        if isinstance(item, dict)
-                    ],
-                    "results": serializer.data,
+                    "ids": [item.get("id") for item in data if isinstance(item, dict)],
+                    "results": data,
                 }
             )
 
         queryset = self.paginate_queryset(queryset)
         if queryset is not None:
-            serializer = self.get_serializer(queryset, many=True)
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(
+                self.serialize_list(queryset, fast_fields)
+            )
+
+    def retrieve(self, request, *args, **kwargs):
+        cached = self.get_cached_response(self.queryset.model)
+        if cached:
+            return cached
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        not_modified = self.check_not_modified(queryset)
+        if not_modified:
+            return not_modified
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=False, methods=["get"])
+    def sync(self, request):
+        """
+        Delta sync: rows changed and ids deleted since the `since` watermark,
+        plus the watermark to send next time. Without `since`, or with one
+        older than the tombstone retention, every row and `full` set, so the
+        client replaces what it has. Watermarks trail the clock by
+        SYNC_WATERMARK_OVERLAP, so consecutive deltas overlap and clients
+        dedupe them by id.
+        """
+        maybe_prune_tombstones()
+        overlap = timedelta(seconds=settings.SYNC_WATERMARK_OVERLAP)
+        watermark = timezone.now() - overlap
+        model = self.queryset.model
+        queryset = self.filter_queryset(self.get_queryset()).order_by("-id")
+        deleted = Tombstone.objects.filter(model=model._meta.label_lower)
+
+        since = request.query_params.get("since")
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                raise ValidationError({"since": "Invalid watermark."})
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        full = not since or since < get_tombstone_cutoff()
+        if full:
+            deleted = deleted.none()
+        else:
+            queryset = queryset.filter(updated_at__gte=since)
+            deleted = deleted.filter(deleted_at__gte=since)
+
+        extra = {
+            "deleted": list(deleted.values_list("object_id", flat=True).distinct()),
+            "watermark": watermark.isoformat().replace("+00:00", "Z"),
+            "full": full,
+        }
+        fast_fields = self.get_fast_fields()
+        if fast_fields is not None:
+            queryset = get_values_queryset(queryset, fast_fields)
+
+        if request.accepted_renderer.format == "json":
+            return stream_list_response(
+                request.accepted_renderer,
+                queryset,
+                lambda rows: self.serialize_list(rows, fast_fields),
+                settings.STREAM_CHUNK_SIZE,
+                extra,
+            )
+
+        data = self.serialize_list(queryset, fast_fields)
+        return response.Response(
+            {
+                "count": len(data),
+                "ids": [item.get("id") for item in data],
+                "results": data,
+                **extra,
+            }
+        )
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """
+        Replays a batch of offline edits in one transaction. The body holds
+        `create` (items with an `id` are upserted), `update` (partial, by
+        `id`) and `delete` (ids) arrays; nothing is written unless every
+        item validates.
+        """
+        model = self.queryset.model
+        creates = request.data.get("create") or []
+        updates = request.data.get("update") or []
+        deletes = request.data.get("delete") or []
+
+        create_pks = []
+        create_pk_errors = []
+        for item in creates if isinstance(creates, list) else []:
+            pk = item.get("id") if isinstance(item, dict) else None
+            try:
+                pk = None if pk is None else to_pk(model, pk)
+            except ValueError:
+                create_pk_errors.append(f"Invalid id {pk}.")
+                continue
+            if pk is not None and pk > READ_ONLY_PK:
+                create_pk_errors.append(
+                    f"Item {pk} is read-only and cannot be changed."
+                )
+            create_pks.append(pk)
+        upsert_pks = [pk for pk in create_pks if pk is not None]
+
+        required = []
+        # Upserting an existing row overwrites it, so it needs change too
+        if updates or model.objects.filter(pk__in=upsert_pks).exists():
+            required.append("change")
+        if deletes:
+            required.append("delete")
+        opts = model._meta
+        if not user_has_perms(
+            request.user,
+            [f"{opts.app_label}.{perm}_{opts.model_name}" for perm in required],
+        ):
+            raise PermissionDenied()
+
+        errors = {}
+        create_serializer = self.get_serializer(data=creates, many=True)
+        resolve_relations(create_serializer.child, creates)
+        if not create_serializer.is_valid():
+            errors["create"] = create_serializer.errors
+        if create_pk_errors:
+            errors.setdefault("create", create_pk_errors)
+
+        update_pks = []
+        for item in updates if isinstance(updates, list) else []:
+            try:
+                update_pks.append(to_pk(model, item.get("id")))
+            except (AttributeError, ValueError):
+                pass
+        context = self.get_serializer_context()
+        update_serializer = BulkUpdateListSerializer(
+            child=self.get_serializer_class()(context=context),
+            instance=self.get_queryset().in_bulk(update_pks),
+            data=updates,
+            partial=True,
+            context=context,
+        )
+        resolve_relations(update_serializer.child, updates)
+        if not update_serializer.is_valid():
+            errors["update"] = update_serializer.errors
+
+        delete_pks = []
+        for pk in deletes if isinstance(deletes, list) else [deletes]:
+            try:
+                pk = to_pk(model, pk)
+            except ValueError:
+                errors.setdefault("delete", []).append(f"Invalid id {pk}.")
+                continue
+            if pk > READ_ONLY_PK:
+                errors.setdefault("delete", []).append(
+                    f"Item {pk} is read-only and cannot be deleted."
+                )
+            delete_pks.append(pk)
+
+        if errors:
+            raise ValidationError(errors)
+
+        create_items = list(zip(create_pks, create_serializer.validated_data))
+        update_items = [
+            (update_serializer.instance[pk], attrs)
+            for pk, attrs in zip(update_pks, update_serializer.validated_data)
+        ]
+        child = create_serializer.child
+        with transaction.atomic():
+            if supports_bulk_writes(model, child):
+                created, updated = bulk_save(model, create_items, update_items)
+            else:
+                created, updated = serial_save(child, model, create_items, update_items)
+            deleted = self.get_queryset().filter(
+                pk__in=delete_pks, pk__lte=READ_ONLY_PK
+            )
+            deleted_pks = list(deleted.values_list("pk", flat=True))
+            with collect_tombstones():
+                deleted.delete()
+
+        objs = self.get_queryset().in_bulk([obj.pk for obj in created + updated])
+        return response.Response(
+            {
+                "created": self.get_serializer(
+                    [objs[obj.pk] for obj in created], many=True
+                ).data,
+                "updated": self.get_serializer(
+                    [objs[obj.pk] for obj in updated], many=True
+                ).data,
+                "deleted": deleted_pks,
+            }
+        )
 
 
 class SettingViewSet(CustomModelViewSet):
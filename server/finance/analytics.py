@@ -2,13 +2,23 @@ from rest_framework import viewsets, response
 from knox.auth import TokenAuthentication
 from django.db.models import Sum, F
 from rest_framework.permissions import IsAuthenticated
-from .models import Transaction
+from .models import Transaction, Category
 from collections import defaultdict
 from core.utils import annotate_period, generate_period_list
 from core.viewsets import CustomAuthentication
+from core.asyncviews import AsyncViewSetMixin
+from core.cache import CachedResponseMixin
+from core.conditional import ConditionalGetMixin
+from core.replicas import ReplicaReadMixin
 
 
-class TransactionAnalyticsViewSet(viewsets.ViewSet):
+class TransactionAnalyticsViewSet(
+    AsyncViewSetMixin,
+    ReplicaReadMixin,
+    CachedResponseMixin,
+    ConditionalGetMixin,
+    viewsets.ViewSet,
+):
     permission_classes = [
         IsAuthenticated,
     ]
@@ -16,7 +26,15 @@ class TransactionAnalyticsViewSet(viewsets.ViewSet):
     authentication_classes = (CustomAuthentication,)
 
     def list(self, request):
+        cached = self.get_cached_response(Transaction)
+        if cached:
+            return cached
+
         queryset = Transaction.objects.all()
+        not_modified = self.check_not_modified(queryset, [Category])
+        if not_modified:
+            return not_modified
+
         queryset = annotate_period(
             queryset,
             "datetime_transacted",
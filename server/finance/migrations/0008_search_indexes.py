@@ -0,0 +1,13 @@
+from django.db import migrations
+from core.search import AddTrigramIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0007_remove_buylistitem_added_at'),
+    ]
+
+    operations = [
+        AddTrigramIndex("transaction", "description"),
+    ]
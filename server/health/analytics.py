@@ -5,9 +5,19 @@ from .models import WeighIn
 from collections import defaultdict
 from core.utils import annotate_period, generate_period_list
 from core.viewsets import CustomAuthentication
+from core.asyncviews import AsyncViewSetMixin
+from core.cache import CachedResponseMixin
+from core.conditional import ConditionalGetMixin
+from core.replicas import ReplicaReadMixin
 
 
-class WeighInAnalyticsViewSet(viewsets.ViewSet):
+class WeighInAnalyticsViewSet(
+    AsyncViewSetMixin,
+    ReplicaReadMixin,
+    CachedResponseMixin,
+    ConditionalGetMixin,
+    viewsets.ViewSet,
+):
     permission_classes = [
         # IsAuthenticated,
         AllowAny
@@ -16,7 +26,15 @@ class WeighInAnalyticsViewSet(viewsets.ViewSet):
     # authentication_classes = (CustomAuthentication,)
 
     def list(self, request):
+        cached = self.get_cached_response(WeighIn)
+        if cached:
+            return cached
+
         queryset = WeighIn.objects.all()
+        not_modified = self.check_not_modified(queryset)
+        if not_modified:
+            return not_modified
+
         queryset = annotate_period(queryset, "date", *("year", "week"))
         period_list = generate_period_list(queryset, "date", *("year", "week"))
         weight_map = {
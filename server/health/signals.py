@@ -14,17 +14,17 @@ def update_gw_completion(sender, instance, **kwargs):
     for setting in Setting.objects.filter(key__in=["UGW", "GW4", "GW3", "GW2", "GW1"]):
 
         goal = Goal.objects.filter(title=setting.key).first()
+        if not goal:
+            continue
 
         if setting.value is not None and setting.value != "":
             goal.description = f"To reach {setting.value} kg"
         else:
             goal.description = ""
 
-        if not goal:
-            continue
         if not setting.value:
             goal.date_completed = timezone.now()
-        elif latest_weighin.weight_kg <= Decimal(setting.value):
+        elif latest_weighin and latest_weighin.weight_kg <= Decimal(setting.value):
             goal.date_completed = timezone.now()
         else:
             goal.date_completed = None
@@ -35,7 +35,7 @@ def update_gw_completion(sender, instance, **kwargs):
             continue
         if not setting.value:
             transition_goal.date_completed = timezone.now()
-        elif latest_weighin.weight_kg <= Decimal(setting.value):
+        elif latest_weighin and latest_weighin.weight_kg <= Decimal(setting.value):
             transition_goal.date_completed = timezone.now()
         else:
             transition_goal.date_completed = None
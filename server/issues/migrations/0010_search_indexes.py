@@ -0,0 +1,16 @@
+from django.db import migrations
+from core.search import AddTrigramIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0009_apprelease'),
+    ]
+
+    operations = [
+        AddTrigramIndex("ticket", "title"),
+        AddTrigramIndex("ticket", "description"),
+        AddTrigramIndex("note", "title"),
+        AddTrigramIndex("note", "body"),
+    ]
@@ -0,0 +1,25 @@
+"""
+gunicorn settings for serving the ASGI application with uvicorn workers, so
+one process can hold many slow clients at once:
+
+    pip install uvicorn-worker
+    gunicorn mysite.asgi:application -c mysite/gunicorn_asgi.py
+
+The WSGI profile (`gunicorn mysite.wsgi`) keeps working unchanged.
+"""
+
+from importlib.util import find_spec
+import os
+
+# Coroutine views and async streaming only make sense under ASGI
+os.environ.setdefault("ASYNC_VIEWS", "true")
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+if find_spec("uvicorn_worker"):
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "30"))
+graceful_timeout = 30
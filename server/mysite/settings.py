@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 from .utils import GET_BOOL, GET_ENV_LIST, LOAD_ENV, GET_ENV
 from datetime import timedelta
+from importlib.util import find_spec
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 LOAD_ENV(BASE_DIR)
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
     "travel",
 ]
 MIDDLEWARE = [
+    "core.middleware.CompressionMiddleware",
     "core.middleware.CsrfExemptMobileMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
@@ -51,7 +53,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django.middleware.common.CommonMiddleware",
-    "djangorestframework_camel_case.middleware.CamelCaseMiddleWare",
+    "core.middleware.CamelCaseQueryMiddleware",
 ]
 
 ROOT_URLCONF = "mysite.urls"
@@ -72,15 +74,72 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "mysite.wsgi.application"
+ASGI_APPLICATION = "mysite.asgi.application"
+# Coroutine views and async streaming; turn on only when serving over ASGI
+ASYNC_VIEWS = GET_BOOL("ASYNC_VIEWS", "False")
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": GET_ENV("DB_ENGINE", "django.db.backends.postgresql"),
         "NAME": os.environ.get("DB_NAME"),
         "USER": os.environ.get("DB_USER"),
         "PASSWORD": os.environ.get("DB_PASS"),
         "HOST": os.environ.get("DB_HOST"),
         "PORT": os.environ.get("DB_PORT"),
+        # Reuse connections across requests, pinging them before reuse
+        "CONN_MAX_AGE": int(GET_ENV("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": GET_BOOL("DB_CONN_HEALTH_CHECKS", "True"),
+        "OPTIONS": {},
+    }
+}
+
+# Read replicas share the primary's credentials and only serve views using
+# core.replicas.ReplicaReadMixin. Each entry of DB_REPLICA_HOSTS or
+# DB_REPLICA_NAMES adds one; a missing host or name falls back to the
+# primary's, so two local databases (or SQLite files) work as well.
+DATABASE_REPLICAS = []
+REPLICA_HOSTS = GET_ENV_LIST("DB_REPLICA_HOSTS")
+REPLICA_NAMES = GET_ENV_LIST("DB_REPLICA_NAMES")
+for index in range(max(len(REPLICA_HOSTS), len(REPLICA_NAMES))):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "TEST": {"MIRROR": "default"},
+    }
+    if index < len(REPLICA_HOSTS):
+        DATABASES[alias]["HOST"] = REPLICA_HOSTS[index]
+    if index < len(REPLICA_NAMES):
+        DATABASES[alias]["NAME"] = REPLICA_NAMES[index]
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["core.replicas.ReplicaRouter"]
+# Seconds a user's reads stay on the primary after they write
+REPLICA_STICKY_SECONDS = int(GET_ENV("REPLICA_STICKY_SECONDS", "5"))
+# CACHES entry remembering recent writers; with replicas it has to be shared
+# by every worker (not LocMemCache), or startup fails
+REPLICA_STICKY_CACHE_ALIAS = GET_ENV("REPLICA_STICKY_CACHE_ALIAS", "default")
+
+# psycopg 3's pool replaces persistent connections when it is installed
+if GET_BOOL("DB_POOL") and find_spec("psycopg_pool"):
+    for database in DATABASES.values():
+        database["CONN_MAX_AGE"] = 0
+        database["OPTIONS"] = {
+            **database["OPTIONS"],
+            "pool": {
+                "min_size": int(GET_ENV("DB_POOL_MIN_SIZE", "2")),
+                "max_size": int(GET_ENV("DB_POOL_MAX_SIZE", "10")),
+                "timeout": float(GET_ENV("DB_POOL_TIMEOUT", "10")),
+                "max_idle": float(GET_ENV("DB_POOL_MAX_IDLE", "300")),
+            },
+        }
+
+# Per-worker copies of responses are fine: they are keyed by the model
+# version counters, which live in the database (core.ModelVersion)
+CACHES = {
+    "default": {
+        "BACKEND": GET_ENV(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": GET_ENV("CACHE_LOCATION", "mysite"),
     }
 }
 
@@ -114,18 +173,76 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": (
-        "djangorestframework_camel_case.render.CamelCaseJSONRenderer",
+        "core.renderers.CamelCaseJSONRenderer",
         "rest_framework.renderers.BrowsableAPIRenderer",
+        "core.renderers.CamelCaseMessagePackRenderer",
     ),
     "DEFAULT_PARSER_CLASSES": (
-        "djangorestframework_camel_case.parser.CamelCaseJSONParser",
+        "core.parsers.CamelCaseJSONParser",
         "rest_framework.parsers.FormParser",
         "rest_framework.parsers.MultiPartParser",
+        "core.parsers.CamelCaseMessagePackParser",
     ),
     "DEFAULT_PAGINATION_CLASS": "core.paginations.CustomPagination",
     "PAGE_SIZE": 10,
     "COERCE_DECIMAL_TO_STRING": False,
 }
+
+FILTER_PLAN_CACHE_SIZE = int(GET_ENV("FILTER_PLAN_CACHE_SIZE", "512"))
+STREAM_CHUNK_SIZE = int(GET_ENV("STREAM_CHUNK_SIZE", "500"))
+APPROXIMATE_COUNT_THRESHOLD = int(GET_ENV("APPROXIMATE_COUNT_THRESHOLD", "100000"))
+RESPONSE_CACHE_TIMEOUT = int(GET_ENV("RESPONSE_CACHE_TIMEOUT", "60"))
+# Seconds sync watermarks are moved back so rows saved before a sync but
+# committed after it still reach the next one; clients dedupe by id
+SYNC_WATERMARK_OVERLAP = int(GET_ENV("SYNC_WATERMARK_OVERLAP", "300"))
+# Longest gap between syncs answered with a delta; older tombstones are pruned
+TOMBSTONE_RETENTION_DAYS = int(GET_ENV("TOMBSTONE_RETENTION_DAYS", "90"))
+TOMBSTONE_PRUNE_INTERVAL = int(GET_ENV("TOMBSTONE_PRUNE_INTERVAL", "3600"))
+TOMBSTONE_PRUNE_CHUNK_SIZE = int(GET_ENV("TOMBSTONE_PRUNE_CHUNK_SIZE", "1000"))
+# Reference tables served together by /bootstrap, keyed by response field
+BOOTSTRAP_TABLES = {
+    "accounts": "finance.viewsets.AccountViewSet",
+    "categories": "finance.viewsets.CategoryViewSet",
+    "inventory_categories": "finance.viewsets.InventoryCategoryViewSet",
+    "platforms": "personal.viewsets.PlatformViewSet",
+    "settings": "core.viewsets.SettingViewSet",
+    "tags": "productivity.viewsets.TagViewSet",
+    "issue_tags": "issues.viewsets.TagViewSet",
+}
+BOOTSTRAP_CACHE_TIMEOUT = int(GET_ENV("BOOTSTRAP_CACHE_TIMEOUT", "86400"))
+BATCH_MAX_REQUESTS = int(GET_ENV("BATCH_MAX_REQUESTS", "50"))
+# Smallest body worth compressing per content type; other types are left as is
+COMPRESSION_MIN_SIZES = {
+    "application/json": 1024,
+    "application/msgpack": 2048,
+    "application/javascript": 1024,
+    "image/svg+xml": 1024,
+    "text/css": 1024,
+    "text/html": 1024,
+    "text/javascript": 1024,
+    "text/plain": 1024,
+}
+# Low levels keep compression well under the serialization time
+COMPRESSION_LEVELS = {
+    "gzip": int(GET_ENV("GZIP_LEVEL", "5")),
+    "br": int(GET_ENV("BROTLI_LEVEL", "4")),
+    "zstd": int(GET_ENV("ZSTD_LEVEL", "3")),
+}
+# Seconds an authenticated token is trusted without hitting the database
+AUTH_TOKEN_CACHE_TIMEOUT = int(GET_ENV("AUTH_TOKEN_CACHE_TIMEOUT", "30"))
+AUTH_TOKEN_CACHE_SIZE = int(GET_ENV("AUTH_TOKEN_CACHE_SIZE", "1000"))
+# Name of a CACHES entry to share it between workers; in process when empty.
+# In process, a logout or deactivation reaches the other workers only once
+# they re-read the AuthToken version (MODEL_VERSION_LOCAL_TIMEOUT seconds).
+AUTH_TOKEN_CACHE_ALIAS = GET_ENV("AUTH_TOKEN_CACHE_ALIAS", "")
+# Seconds a worker trusts its copy of a model version before reading it again
+MODEL_VERSION_LOCAL_TIMEOUT = int(GET_ENV("MODEL_VERSION_LOCAL_TIMEOUT", "2"))
+# Older tokens beyond this many per user are deleted at login (0 disables)
+AUTH_TOKEN_LIMIT_PER_USER = int(GET_ENV("AUTH_TOKEN_LIMIT_PER_USER", "10"))
+# Seconds between background sweeps of expired tokens (0 disables)
+TOKEN_SWEEP_INTERVAL = int(GET_ENV("TOKEN_SWEEP_INTERVAL", "3600"))
+TOKEN_SWEEP_CHUNK_SIZE = int(GET_ENV("TOKEN_SWEEP_CHUNK_SIZE", "1000"))
+PERMISSION_CACHE_TIMEOUT = int(GET_ENV("PERMISSION_CACHE_TIMEOUT", "300"))
 REST_KNOX = {
     "TOKEN_TTL": timedelta(days=int(GET_ENV("COOKIE_EXPIRE_DAYS", "7"))),
 }
@@ -0,0 +1,15 @@
+from django.db import migrations
+from core.search import AddTrigramIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personal', '0009_remove_credential_date_created_and_more'),
+    ]
+
+    operations = [
+        AddTrigramIndex("journal", "title"),
+        AddTrigramIndex("journal", "description"),
+        AddTrigramIndex("dream", "entry"),
+    ]
@@ -141,16 +141,22 @@ def ensure_aware(dt):
 
 
 def generate_missing_events(params=None):
+    """
+    Creates the scheduled events of every task between `date_start__gte` and
+    `date_start__lte`, archiving (or deleting) the ones no longer scheduled.
+    Returns the (created, archived) counts.
+    """
     if not params:
-        return []
+        return 0, 0
 
     from .models import Task, Event
+    from core.versions import bump_model_version
 
     try:
         start = safe_parse_datetime(params.get("date_start__gte", None))
         end = safe_parse_datetime(params.get("date_start__lte", None))
     except:
-        return []
+        return 0, 0
 
     start = ensure_aware(start)
     end = ensure_aware(end)
@@ -164,6 +170,8 @@ def generate_missing_events(params=None):
         return True
 
     new_events = []
+    archived = 0
+    removed = 0
 
     for task in Task.objects.all():
         if task.schedule:
@@ -183,6 +191,8 @@ def generate_missing_events(params=None):
             .filter(date_completed=None, is_archived=True)
             .delete()
         )
+        archived += updated
+        removed += deleted
         if updated > 0:
             print(
                 f"Archived {updated} incorrect events for task {task.pk} - {list(
@@ -223,4 +233,8 @@ def generate_missing_events(params=None):
                 f"Creating {len(to_create)} events for Task #{task.pk} "
                 f"from {to_create[0].date_start} to {to_create[-1].date_start}"
             )
-    return new_events
+
+    # update() and bulk_create() skip the signals that retire cached lists
+    if archived or new_events:
+        bump_model_version(Event)
+    return len(new_events), archived + removed
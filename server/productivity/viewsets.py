@@ -1,5 +1,6 @@
 from .models import *
 from .serializers import *
+from core.replicas import record_write
 from core.viewsets import CustomModelViewSet
 from .utils import generate_missing_events
 
@@ -32,10 +33,14 @@ class TagViewSet(CustomModelViewSet):
 class EventViewSet(CustomModelViewSet):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
+    # list writes generated events, so it has to read them on the primary
+    replica_actions = ("retrieve",)
 
     def list(self, request, *args, **kwargs):
         params = self.request.query_params.copy()
-        generate_missing_events(params)
+        created, archived = generate_missing_events(params)
+        if created or archived:
+            record_write(request.user)
         return super().list(request, *args, **kwargs)
 
 